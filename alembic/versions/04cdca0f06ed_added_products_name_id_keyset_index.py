@@ -0,0 +1,32 @@
+"""added products name id keyset index
+
+Revision ID: 04cdca0f06ed
+Revises: 2aa7df60dfed
+Create Date: 2026-10-18 10:02:11.482913
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "04cdca0f06ed"
+down_revision: Union[str, None] = "2aa7df60dfed"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_products_name_desc_id",
+        "products",
+        [sa.text("name DESC"), "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_name_desc_id", table_name="products")
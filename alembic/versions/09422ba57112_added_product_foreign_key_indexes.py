@@ -0,0 +1,90 @@
+"""added product foreign key indexes
+
+Revision ID: 09422ba57112
+Revises: c3c065df359a
+Create Date: 2026-10-18 15:12:37.904512
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "09422ba57112"
+down_revision: Union[str, None] = "c3c065df359a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# CONCURRENTLY cannot run inside a transaction, hence the autocommit blocks.
+# products.name is already covered by ix_products_name_desc_id (04cdca0f06ed).
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_product_images_product_id",
+            "product_images",
+            ["product_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_products_category_id_name_desc_id",
+            "products",
+            ["category_id", sa.text("name DESC"), "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        # the primary keys already enforce uniqueness of id
+        op.drop_index(
+            "ix_product_images_id",
+            table_name="product_images",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_products_id", table_name="products", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_product_categories_id",
+            table_name="product_categories",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_product_categories_id",
+            "product_categories",
+            ["id"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_products_id",
+            "products",
+            ["id"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_product_images_id",
+            "product_images",
+            ["id"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_products_category_id_name_desc_id",
+            table_name="products",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_product_images_product_id",
+            table_name="product_images",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,40 @@
+"""added cart items table
+
+Revision ID: 494d9534123b
+Revises: edb4bb627b2b
+Create Date: 2026-10-18 17:48:30.905117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "494d9534123b"
+down_revision: Union[str, None] = "edb4bb627b2b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cart_items",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "product_id"),
+    )
+    op.create_index(
+        "ix_cart_items_product_id", "cart_items", ["product_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_cart_items_product_id", table_name="cart_items")
+    op.drop_table("cart_items")
@@ -0,0 +1,63 @@
+"""backfilled product skus
+
+Revision ID: 5b1e7c0d9a42
+Revises: 494d9534123b
+Create Date: 2026-10-18 20:12:07.318544
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5b1e7c0d9a42"
+down_revision: Union[str, None] = "494d9534123b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The import upserts on sku, so a product without one could be exported but
+# never imported back. Products created before 7877362e20f4 get "P-<id>", in
+# batches that commit one by one, and a trigger gives the same to any product
+# inserted without a sku from now on.
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE FUNCTION products_default_sku() RETURNS trigger AS $$
+        BEGIN
+            NEW.sku := coalesce(NEW.sku, 'P-' || NEW.id);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER products_default_sku "
+        "BEFORE INSERT ON products "
+        "FOR EACH ROW EXECUTE FUNCTION products_default_sku()"
+    )
+    with op.get_context().autocommit_block():
+        backfill = sa.text(
+            """
+            UPDATE products SET sku = 'P-' || id
+            WHERE id IN (SELECT id FROM products WHERE sku IS NULL LIMIT :batch_size)
+            """
+        )
+        connection = op.get_bind()
+        while connection.execute(
+            backfill, {"batch_size": BACKFILL_BATCH_SIZE}
+        ).rowcount:
+            pass
+
+
+def downgrade() -> None:
+    # the backfilled skus stay, they are valid import keys
+    op.execute("DROP TRIGGER products_default_sku ON products")
+    op.execute("DROP FUNCTION products_default_sku()")
@@ -0,0 +1,80 @@
+"""added product import keys
+
+Revision ID: 7877362e20f4
+Revises: 09422ba57112
+Create Date: 2026-10-18 16:20:44.581306
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7877362e20f4"
+down_revision: Union[str, None] = "09422ba57112"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Natural keys the bulk import upserts on. Duplicate category names or
+# product images must be merged before upgrading.
+
+
+def upgrade() -> None:
+    op.add_column("products", sa.Column("sku", sa.String(length=64), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_products_sku",
+            "products",
+            ["sku"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_product_categories_name",
+            "product_categories",
+            ["name"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_product_images_product_id_link",
+            "product_images",
+            ["product_id", "link"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        # superseded by the unique (product_id, link) index
+        op.drop_index(
+            "ix_product_images_product_id",
+            table_name="product_images",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_product_images_product_id",
+            "product_images",
+            ["product_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_product_images_product_id_link",
+            table_name="product_images",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_product_categories_name",
+            table_name="product_categories",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_products_sku", table_name="products", postgresql_concurrently=True
+        )
+    op.drop_column("products", "sku")
@@ -0,0 +1,103 @@
+"""added product search vector
+
+Revision ID: c3c065df359a
+Revises: d20866df9b68
+Create Date: 2026-10-18 14:05:52.660127
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c3c065df359a"
+down_revision: Union[str, None] = "d20866df9b68"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# A STORED generated column would rewrite products under an ACCESS EXCLUSIVE
+# lock. Instead the vector is a plain column set by a trigger, backfilled in
+# batches that commit one by one, and indexed CONCURRENTLY, which cannot run
+# inside a transaction, hence the autocommit blocks.
+
+SEARCH_VECTOR = (
+    "to_tsvector('english'::regconfig, "
+    "coalesce({row}name, '') || ' ' || coalesce({row}description, ''))"
+)
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "products",
+        sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True),
+    )
+    op.execute(
+        f"""
+        CREATE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR.format(row="NEW.")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER products_search_vector "
+        "BEFORE INSERT OR UPDATE OF name, description ON products "
+        "FOR EACH ROW EXECUTE FUNCTION products_search_vector_update()"
+    )
+    with op.get_context().autocommit_block():
+        backfill = sa.text(
+            f"""
+            UPDATE products SET search_vector = {SEARCH_VECTOR.format(row="")}
+            WHERE id IN (
+                SELECT id FROM products WHERE search_vector IS NULL LIMIT :batch_size
+            )
+            """
+        )
+        connection = op.get_bind()
+        while connection.execute(
+            backfill, {"batch_size": BACKFILL_BATCH_SIZE}
+        ).rowcount:
+            pass
+        op.create_index(
+            "ix_products_search_vector",
+            "products",
+            ["search_vector"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_products_name_trgm",
+            "products",
+            ["name"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_products_name_trgm",
+            table_name="products",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_products_search_vector",
+            table_name="products",
+            postgresql_concurrently=True,
+        )
+    op.execute("DROP TRIGGER products_search_vector ON products")
+    op.execute("DROP FUNCTION products_search_vector_update()")
+    op.drop_column("products", "search_vector")
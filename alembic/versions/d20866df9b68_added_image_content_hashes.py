@@ -0,0 +1,33 @@
+"""added image content hashes
+
+Revision ID: d20866df9b68
+Revises: 67cebd008a01
+Create Date: 2026-10-18 12:41:09.318744
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d20866df9b68"
+down_revision: Union[str, None] = "67cebd008a01"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "product_images", sa.Column("content_hash", sa.String(length=64), nullable=True)
+    )
+    op.add_column(
+        "users", sa.Column("profile_picture_hash", sa.String(length=64), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "profile_picture_hash")
+    op.drop_column("product_images", "content_hash")
@@ -0,0 +1,84 @@
+"""added orders tables
+
+Revision ID: edb4bb627b2b
+Revises: 7877362e20f4
+Create Date: 2026-10-18 17:05:12.418230
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "edb4bb627b2b"
+down_revision: Union[str, None] = "7877362e20f4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "orders",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM("placed", "cancelled", name="orderstatus"),
+            nullable=False,
+        ),
+        sa.Column("total_price", sa.Float(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_orders_user_id_created_at",
+        "orders",
+        ["user_id", sa.text("created_at DESC")],
+        unique=False,
+    )
+    op.create_table(
+        "order_items",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("order_id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("unit_price", sa.Float(), nullable=False),
+        sa.CheckConstraint("quantity > 0", name="ck_order_items_quantity"),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_order_items_order_id", "order_items", ["order_id"], unique=False
+    )
+    op.create_index(
+        "ix_order_items_product_id", "order_items", ["product_id"], unique=False
+    )
+    # Adding the check NOT VALID skips the scan of products, so its ACCESS
+    # EXCLUSIVE lock is short. The scan happens in VALIDATE, which only takes
+    # SHARE UPDATE EXCLUSIVE, but locks are held until commit: it runs after
+    # the migration transaction is committed, or the strong lock would last
+    # for the whole scan.
+    op.execute(
+        "ALTER TABLE products ADD CONSTRAINT ck_products_stock_non_negative "
+        "CHECK (stock >= 0) NOT VALID"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "ALTER TABLE products VALIDATE CONSTRAINT ck_products_stock_non_negative"
+        )
+
+
+def downgrade() -> None:
+    op.drop_constraint("ck_products_stock_non_negative", "products", type_="check")
+    op.drop_index("ix_order_items_product_id", table_name="order_items")
+    op.drop_index("ix_order_items_order_id", table_name="order_items")
+    op.drop_table("order_items")
+    op.drop_index("ix_orders_user_id_created_at", table_name="orders")
+    op.drop_table("orders")
+    postgresql.ENUM(name="orderstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,80 @@
+"""Turn away request bodies over their route's limit before they are received.
+
+Starlette parses a multipart form, spooling every file to disk, before the
+endpoint runs, so save_image_upload()'s own check only comes after the whole
+upload arrived. This middleware answers 413 straight away when Content-Length
+is over the limit, and stops reading a body without one (or with a wrong one)
+as soon as it passes the limit. GraphQL requests are limited too: their
+cost is only known once the whole document has been parsed.
+"""
+
+import re
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from schemas.extensions import GRAPHQL_MAX_BODY_SIZE
+from services.upload_service import MAX_PRODUCT_IMAGE_SIZE, MAX_PROFILE_PICTURE_SIZE
+
+# room for the multipart boundaries and the other form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+# (method, path regex, most bytes the body may have)
+BODY_LIMITS = [
+    ("PATCH", r"/api/v1/users/my-profile", MAX_PROFILE_PICTURE_SIZE),
+    ("POST", r"/api/v1/products/\d+/images", MAX_PRODUCT_IMAGE_SIZE),
+    ("POST", r"/graphql/?", GRAPHQL_MAX_BODY_SIZE),
+]
+
+
+class BodySizeLimitMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: list[tuple[str, str, int]] = BODY_LIMITS,
+        overhead: int = MULTIPART_OVERHEAD,
+    ):
+        self.app = app
+        self.limits = [
+            (method, re.compile(path), limit + overhead)
+            for method, path, limit in limits
+        ]
+
+    def limit_for(self, method: str, path: str) -> int | None:
+        for limit_method, pattern, limit in self.limits:
+            if method == limit_method and pattern.fullmatch(path):
+                return limit
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limit_for(scope["method"], scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(
+                {"detail": "Request body is too large"}, status_code=413
+            )
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def receive_within_limit() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI lets HTTPExceptions from body parsing through
+                    raise HTTPException(
+                        status_code=413, detail="Request body is too large"
+                    )
+            return message
+
+        await self.app(scope, receive_within_limit, send)
@@ -0,0 +1,142 @@
+"""GraphQL endpoint with Automatic Persisted Queries (APQ).
+
+Clients send `extensions.persistedQuery.sha256Hash` instead of the query
+text. An unknown hash gets a PERSISTED_QUERY_NOT_FOUND error, and the client
+retries once with the text and the hash to register it. With
+GRAPHQL_APQ_ALLOWLIST_ONLY only the queries listed in
+GRAPHQL_PERSISTED_QUERIES_FILE can run, by hash or by text.
+"""
+
+import hmac
+import json
+import os
+
+from dotenv import load_dotenv
+from graphql import GraphQLError
+from strawberry.fastapi import GraphQLRouter
+from strawberry.http import GraphQLRequestData
+from strawberry.http.exceptions import HTTPException
+from strawberry.http.parse_content_type import parse_content_type
+from strawberry.types import ExecutionResult
+
+from schemas.extensions import query_hash, register_metric_operations
+from services.cache import TTLCache
+
+load_dotenv()
+
+GRAPHQL_APQ_CACHE_SIZE = int(os.getenv("GRAPHQL_APQ_CACHE_SIZE", "1000"))
+GRAPHQL_APQ_CACHE_TTL = float(os.getenv("GRAPHQL_APQ_CACHE_TTL", "86400"))
+GRAPHQL_PERSISTED_QUERIES_FILE = os.getenv("GRAPHQL_PERSISTED_QUERIES_FILE")
+GRAPHQL_APQ_ALLOWLIST_ONLY = (
+    os.getenv("GRAPHQL_APQ_ALLOWLIST_ONLY", "false").lower() == "true"
+)
+
+
+class PersistedQueryError(Exception):
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+def load_persisted_queries(path: str | None) -> dict[str, str]:
+    """Read `{hash: query}`, or an Apollo persisted query manifest, from `path`."""
+    if not path:
+        return {}
+    with open(path) as file:
+        data = json.load(file)
+    if "operations" in data:
+        queries = [operation["body"] for operation in data["operations"]]
+    else:
+        queries = list(data.values())
+    return {query_hash(query): query for query in queries}
+
+
+class PersistedQueries:
+    def __init__(self, allowlist: dict[str, str], allowlist_only: bool = False):
+        self.allowlist = allowlist
+        self.allowlist_only = allowlist_only
+        self.registered = TTLCache(
+            maxsize=GRAPHQL_APQ_CACHE_SIZE, ttl=GRAPHQL_APQ_CACHE_TTL
+        )
+
+    def lookup(self, sha256_hash: str) -> str | None:
+        return self.allowlist.get(sha256_hash) or self.registered.get(sha256_hash)
+
+    def resolve(self, query: str | None, persisted_query: dict | None) -> str | None:
+        """The query text to execute for a request's `query` and persistedQuery extension."""
+        if persisted_query is None:
+            if query is not None and self.allowlist_only:
+                if query_hash(query) not in self.allowlist:
+                    raise PersistedQueryError(
+                        "Query is not in the allowlist", "PERSISTED_QUERY_NOT_ALLOWED"
+                    )
+            return query
+
+        sha256_hash = persisted_query.get("sha256Hash")
+        if persisted_query.get("version") != 1 or not isinstance(sha256_hash, str):
+            raise PersistedQueryError(
+                "Unsupported persisted query version", "PERSISTED_QUERY_NOT_SUPPORTED"
+            )
+        if query is None:
+            query = self.lookup(sha256_hash)
+            if query is None:
+                raise PersistedQueryError(
+                    "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND"
+                )
+            return query
+
+        if not hmac.compare_digest(query_hash(query), sha256_hash):
+            raise HTTPException(400, "provided sha does not match query")
+        if self.allowlist_only:
+            if sha256_hash not in self.allowlist:
+                raise PersistedQueryError(
+                    "Query is not in the allowlist", "PERSISTED_QUERY_NOT_ALLOWED"
+                )
+        else:
+            self.registered.set(sha256_hash, query)
+        return query
+
+
+persisted_queries = PersistedQueries(
+    load_persisted_queries(GRAPHQL_PERSISTED_QUERIES_FILE),
+    allowlist_only=GRAPHQL_APQ_ALLOWLIST_ONLY,
+)
+# the allowlist is ours, unlike queries registered by clients at runtime
+register_metric_operations(persisted_queries.allowlist.values())
+
+
+class PersistedQueryRouter(GraphQLRouter):
+    async def parse_http_body(self, request) -> GraphQLRequestData:
+        persisted_query = (await self.parse_extensions(request)).get("persistedQuery")
+        # the base class also detects multipart subscriptions and parses uploads,
+        # it only drops the extensions
+        request_data = await super().parse_http_body(request)
+        request_data.query = persisted_queries.resolve(
+            request_data.query, persisted_query
+        )
+        return request_data
+
+    async def parse_extensions(self, request) -> dict:
+        if request.method == "GET":
+            extensions = request.query_params.get("extensions")
+            data = {"extensions": self.parse_json(extensions) if extensions else None}
+        elif "application/json" in parse_content_type(request.content_type or "")[0]:
+            data = self.parse_json(await request.get_body())
+        else:  # multipart uploads
+            return {}
+        if not isinstance(data, dict) or not isinstance(
+            data.get("extensions") or {}, dict
+        ):
+            raise HTTPException(400, "Expected a JSON object")
+        return data.get("extensions") or {}
+
+    async def execute_operation(self, request, context, root_value):
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryError as exc:
+            # a GraphQL error rather than an HTTP one, which is what APQ clients expect
+            return ExecutionResult(
+                data=None,
+                errors=[GraphQLError(exc.message, extensions={"code": exc.code})],
+            )
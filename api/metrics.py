@@ -0,0 +1,54 @@
+import time
+
+from fastapi import APIRouter, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.metrics import http_request_duration, render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
+class MetricsMiddleware:
+    """Time HTTP requests until their last body chunk is sent, by route template.
+
+    Plain ASGI rather than BaseHTTPMiddleware, which would buffer streaming
+    responses. Paths that match no route are counted under "unmatched" so
+    scanners can't create a label per URL.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # the router fills in the matched route, or root_path for a mount
+            route = scope.get("route")
+            if route is not None:
+                label = route.path
+            elif scope.get("root_path") and status != 404:
+                label = scope["root_path"]
+            else:
+                label = "unmatched"
+            http_request_duration.labels(scope["method"], label, str(status)).observe(
+                time.perf_counter() - started
+            )
@@ -0,0 +1,20 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from database.query_tracker import track_queries
+
+
+class QueryTrackerMiddleware:
+    """Track the statements of each HTTP request and report repeated ones at its end."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_queries(f"{scope['method']} {scope['path']}") as tracker:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                tracker.report()
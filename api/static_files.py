@@ -0,0 +1,93 @@
+import os
+import re
+from mimetypes import guess_type
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Receive, Scope, Send
+
+# uploads/images/<aa>/<sha256>/<variant>.<ext>, written once and never changed
+CONTENT_ADDRESSED_PATH = re.compile(r"images/[0-9a-f]{2}/([0-9a-f]{64})/([\w.]+)$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+# precompressed siblings in order of preference
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class UploadFileResponse(FileResponse):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # hand the whole file to the server when it supports the pathsend extension
+        if (
+            "http.response.pathsend" in scope.get("extensions", {})
+            and scope["method"].upper() != "HEAD"
+            and "range" not in Headers(scope=scope)
+            and self.background is None
+        ):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": self.status_code,
+                    "headers": self.raw_headers,
+                }
+            )
+            await send(
+                {"type": "http.response.pathsend", "path": os.path.abspath(self.path)}
+            )
+            return
+        await super().__call__(scope, receive, send)
+
+    def _should_use_range(
+        self, http_if_range: str, stat_result: os.stat_result
+    ) -> bool:
+        return http_if_range in (self.headers["etag"], self.headers["last-modified"])
+
+
+class UploadsStaticFiles(StaticFiles):
+    """StaticFiles with long-lived caching for content-addressed uploads."""
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        headers = {}
+
+        path, encoding, vary = full_path, None, False
+        accept_encoding = request_headers.get("accept-encoding", "")
+        for candidate_encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if not os.path.isfile(full_path + suffix):
+                continue
+            vary = True
+            if encoding is None and candidate_encoding in accept_encoding:
+                path, encoding = full_path + suffix, candidate_encoding
+        if vary:
+            headers["vary"] = "accept-encoding"
+        if encoding is not None:
+            headers["content-encoding"] = encoding
+            stat_result = os.stat(path)
+
+        match = CONTENT_ADDRESSED_PATH.search(full_path.replace(os.sep, "/"))
+        if match:
+            content_hash, name = match.groups()
+            headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+            # the bytes are fixed by the path, so the etag can be too
+            headers["etag"] = f'"{content_hash}-{name}-{encoding or "identity"}"'
+        else:
+            headers["cache-control"] = DEFAULT_CACHE_CONTROL
+
+        response = UploadFileResponse(
+            path,
+            status_code=status_code,
+            headers=headers,
+            media_type=guess_type(full_path)[0],
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
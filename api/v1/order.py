@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import models
+from dependencies.auth import get_current_user
+from dependencies.get_db import get_db
+from serializers import order_serializer
+from services.order_service import (
+    cancel_order_view,
+    my_orders_view,
+    place_order_view,
+)
+
+router = APIRouter()
+
+
+@router.post("", response_model=order_serializer.Order, status_code=201)
+async def place_order(
+    order_serializer_input: order_serializer.OrderCreate,
+    current_user: models.DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    return await place_order_view(
+        order_serializer_input=order_serializer_input,
+        current_user=current_user,
+        db=db,
+    )
+
+
+@router.get("", response_model=list[order_serializer.Order])
+async def my_orders(
+    current_user: models.DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    return await my_orders_view(current_user=current_user, db=db)
+
+
+@router.post("/{order_id}/cancel", response_model=order_serializer.Order)
+async def cancel_order(
+    order_id: int,
+    current_user: models.DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    return await cancel_order_view(order_id=order_id, current_user=current_user, db=db)
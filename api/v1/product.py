@@ -1,11 +1,84 @@
-from fastapi import APIRouter, Depends
+import io
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from dependencies.get_db import get_db
+from database import models
+from dependencies.auth import get_current_admin
+from dependencies.get_db import get_db, get_read_db
+from serializers import product_serializer
+from services.export_service import (
+    EXPORT_MEDIA_TYPES,
+    build_export_query,
+    stream_products_export,
+)
+from services.import_service import detect_format, import_products, log_progress
+from services.product_service import add_product_image
 
 router = APIRouter()
 
 
 @router.get("/products")
-async def something(db: AsyncSession = Depends(get_db)):
+async def something(db: AsyncSession = Depends(get_read_db)):
     pass
+
+
+@router.get("/export")
+async def export_products(
+    export_format: Literal["ndjson", "csv"] = "ndjson",
+    category_id: int | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    in_stock: bool | None = None,
+    admin: models.DBUser = Depends(get_current_admin),
+):
+    query = build_export_query(
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+    )
+    return StreamingResponse(
+        stream_products_export(export_format, query),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "content-disposition": f'attachment; filename="products.{export_format}"'
+        },
+    )
+
+
+@router.post("/import")
+async def import_products_view(
+    file: UploadFile,
+    file_format: str | None = None,
+    admin: models.DBUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    file_format = file_format or detect_format(file.filename)
+    if file_format not in ("csv", "jsonl"):
+        raise HTTPException(
+            status_code=400, detail="Upload a .csv or .jsonl file or pass file_format"
+        )
+    # the upload is already spooled to a temporary file, read it from there in batches
+    text_file = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        report = await import_products(db, text_file, file_format, log_progress)
+    finally:
+        text_file.detach()
+    return report.as_dict()
+
+
+@router.post(
+    "/{product_id}/images",
+    response_model=product_serializer.ProductImage,
+    status_code=201,
+)
+async def upload_product_image(
+    product_id: int,
+    image: UploadFile,
+    admin: models.DBUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    return await add_product_image(db=db, product_id=product_id, image=image)
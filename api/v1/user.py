@@ -2,6 +2,8 @@ from fastapi import Depends, APIRouter, Response, Request, UploadFile
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from database import models
+from dependencies.auth import get_current_user, get_token_claims
 from dependencies.get_db import get_db
 from serializers import user_serializer
 from services.user_service import (
@@ -69,22 +71,22 @@ async def verify_email(token: str, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/my-profile", response_model=user_serializer.MyProfile)
-async def my_profile(request: Request, db: AsyncSession = Depends(get_db)):
-    return await my_profile_view(request=request, db=db)
+async def my_profile(current_user: models.DBUser = Depends(get_current_user)):
+    return await my_profile_view(current_user=current_user)
 
 
 @router.patch("/my-profile", response_model=user_serializer.MyProfile)
 async def edit_my_profile(
-    request: Request,
     username: str = None,
     bio: str = None,
     profile_picture: UploadFile | str = None,
+    claims: dict = Depends(get_token_claims),
     db: AsyncSession = Depends(get_db),
 ):
     return await edit_my_profile_view(
         username=username,
         bio=bio,
         profile_picture=profile_picture,
-        request=request,
+        claims=claims,
         db=db,
     )
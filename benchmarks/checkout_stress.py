@@ -0,0 +1,168 @@
+"""Fire many parallel checkouts at a few hot products and check nothing oversells.
+
+    python -m benchmarks.checkout_stress [--checkouts 500] [--stock 100]
+
+Creates a throwaway user, category and products, runs the checkouts
+concurrently through services.order_service (multi-item orders list their
+products in random order), then verifies that stock never went negative,
+that units sold plus units left equal the starting stock, and that no
+checkout failed with anything other than 409. Everything it created is
+deleted afterwards. Exits with status 1 when a check fails.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+
+from database import models
+from database.engine import async_session, engine
+from serializers.order_serializer import OrderItemInput
+from services.order_service import place_order
+
+
+async def create_fixtures(stock: int, products: int) -> tuple[int, list[int]]:
+    tag = uuid.uuid4().hex[:8]
+    async with async_session() as db:
+        user = models.DBUser(
+            username=f"stress_{tag}",
+            email=f"stress_{tag}@example.com",
+            password="!",
+        )
+        category = models.DBProductCategory(name=f"stress_{tag}")
+        hot_products = [
+            models.DBProduct(
+                name=f"stress {tag} {index}", price=10, stock=stock, category=category
+            )
+            for index in range(products)
+        ]
+        db.add_all([user, category, *hot_products])
+        await db.commit()
+        return user.id, [product.id for product in hot_products]
+
+
+async def drop_fixtures(user_id: int, product_ids: list[int]) -> None:
+    async with async_session() as db:
+        await db.execute(
+            delete(models.DBOrder).filter(models.DBOrder.user_id == user_id)
+        )
+        category_id = await db.scalar(
+            select(models.DBProduct.category_id).filter(
+                models.DBProduct.id == product_ids[0]
+            )
+        )
+        await db.execute(
+            delete(models.DBProduct).filter(models.DBProduct.id.in_(product_ids))
+        )
+        await db.execute(
+            delete(models.DBProductCategory).filter(
+                models.DBProductCategory.id == category_id
+            )
+        )
+        await db.execute(delete(models.DBUser).filter(models.DBUser.id == user_id))
+        await db.commit()
+
+
+async def checkout(user_id: int, product_ids: list[int], quantity: int):
+    chosen = random.sample(product_ids, k=random.randint(1, len(product_ids)))
+    items = [
+        OrderItemInput(product_id=product_id, quantity=quantity)
+        for product_id in chosen
+    ]
+    started = time.perf_counter()
+    async with async_session() as db:
+        try:
+            order = await place_order(db, user_id, items)
+        except HTTPException as exc:
+            return exc.status_code, time.perf_counter() - started, None
+        except Exception as exc:  # deadlocks, pool timeouts...
+            return repr(exc), time.perf_counter() - started, None
+    return 201, time.perf_counter() - started, order
+
+
+async def run(checkouts: int, stock: int, products: int, quantity: int) -> bool:
+    user_id, product_ids = await create_fixtures(stock, products)
+    try:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(checkout(user_id, product_ids, quantity) for _ in range(checkouts))
+        )
+        elapsed = time.perf_counter() - started
+
+        async with async_session() as db:
+            left = dict(
+                (
+                    await db.execute(
+                        select(models.DBProduct.id, models.DBProduct.stock).filter(
+                            models.DBProduct.id.in_(product_ids)
+                        )
+                    )
+                ).all()
+            )
+            sold = dict(
+                (
+                    await db.execute(
+                        select(
+                            models.DBOrderItem.product_id,
+                            func.sum(models.DBOrderItem.quantity),
+                        )
+                        .join(models.DBOrder)
+                        .filter(models.DBOrder.user_id == user_id)
+                        .group_by(models.DBOrderItem.product_id)
+                    )
+                ).all()
+            )
+    finally:
+        await drop_fixtures(user_id, product_ids)
+
+    statuses = [status for status, _, _ in results]
+    latencies = sorted(latency for _, latency, _ in results)
+    errors = [status for status in statuses if status not in (201, 409)]
+    print(f"checkouts:      {checkouts} in {elapsed:.2f}s")
+    print(f"placed:         {statuses.count(201)}")
+    print(f"out of stock:   {statuses.count(409)}")
+    print(f"errors:         {len(errors)} {errors[:3]}")
+    print(
+        f"latency ms:     p50 {statistics.median(latencies) * 1000:.1f} "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} "
+        f"max {latencies[-1] * 1000:.1f}"
+    )
+
+    ok = not errors
+    for product_id in product_ids:
+        units_sold = sold.get(product_id, 0)
+        consistent = left[product_id] >= 0 and units_sold + left[product_id] == stock
+        ok = ok and consistent
+        print(
+            f"product {product_id}:  sold {units_sold}, left {left[product_id]}"
+            f"{'' if consistent else '  <-- INCONSISTENT'}"
+        )
+    return ok
+
+
+async def main_async(args) -> bool:
+    try:
+        return await run(args.checkouts, args.stock, args.products, args.quantity)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent checkout stress test")
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--products", type=int, default=3)
+    parser.add_argument("--quantity", type=int, default=1)
+    args = parser.parse_args()
+    if not asyncio.run(main_async(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""Load test the main REST and GraphQL endpoints and compare runs between commits.
+
+    python -m benchmarks.endpoints [--sizes 100,1000,10000] [--duration 5]
+        [--concurrency 20] [--output results.json] [--baseline old.json]
+    python -m benchmarks.endpoints --compare old.json new.json
+
+Boots main.app in-process, lifespan included, and sends requests through
+httpx's ASGITransport: the numbers cover middleware, routing, validation,
+serialization and the database, but not uvicorn or the network. It seeds a
+throwaway category, a verified login user and --users other users, then for
+each catalog size grows the category to that many products (one image each)
+and runs every scenario with --concurrency workers for --duration seconds,
+after --warmup seconds whose requests are not counted. Everything it created
+is deleted afterwards.
+
+getAllProducts pages through the seeded category from random cursors, and
+searchProducts looks for random words of the seeded names (the same ones for
+the same --seed). The GraphQL result cache is off unless
+GRAPHQL_RESULT_CACHE is set, so listings reach the database.
+
+Results are written as JSON along with the commit they were measured on.
+With --baseline, or --compare for two saved files, every scenario whose p95
+latency rose or whose throughput fell by more than --tolerance, or that
+started failing, is flagged and the exit status is 1. Only compare runs made
+on the same machine with the same settings.
+"""
+
+import os
+
+# measure the database path, not cache hits; set it to compare with the cache
+os.environ.setdefault("GRAPHQL_RESULT_CACHE", "off")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import hashlib  # noqa: E402
+import json  # noqa: E402
+import math  # noqa: E402
+import platform  # noqa: E402
+import random  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+import uuid  # noqa: E402
+from collections import Counter  # noqa: E402
+from datetime import datetime, timezone  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Awaitable, Callable  # noqa: E402
+
+import httpx  # noqa: E402
+from sqlalchemy import delete, func, insert, select  # noqa: E402
+
+from database import models  # noqa: E402
+from database.config import DB_POOL_SIZE  # noqa: E402
+from database.engine import async_session, engine  # noqa: E402
+from main import app  # noqa: E402
+from schemas.product_schema import product_cursor  # noqa: E402
+from services.password_service import hash_password  # noqa: E402
+from services.result_cache import GRAPHQL_RESULT_CACHE  # noqa: E402
+
+SCENARIOS = ("login", "my-profile", "getAllProducts", "searchProducts", "getAllUsers")
+PASSWORD = "benchmark-password"
+SEED_CHUNK = 1000
+RESULTS_DIR = Path(__file__).parent / "results"
+# seeded names and descriptions, so that searches match a realistic share of rows
+ADJECTIVES = ("brass", "compact", "folding", "rugged", "vintage", "wireless", "wooden")
+NOUNS = ("backpack", "blender", "kettle", "lantern", "speaker", "tent", "torch")
+USES = ("camping", "hiking", "kitchen", "office", "travel", "workshop")
+
+PRODUCT_PAGE = """
+    query Products($first: Int!, $after: String, $filters: ProductFilter) {
+      getAllProducts(first: $first, after: $after, filters: $filters) {
+        edges {
+          cursor
+          node {
+            id name description price discountPrice stock createdAt
+            category { id name }
+            images { id link }
+          }
+        }
+        pageInfo { hasNextPage hasPreviousPage }
+      }
+    }
+"""
+PRODUCT_SEARCH = """
+    query Search($query: String!, $first: Int!, $filters: ProductFilter) {
+      searchProducts(query: $query, first: $first, filters: $filters) {
+        edges { cursor node { id name price images { id link } } }
+        pageInfo { hasNextPage }
+      }
+    }
+"""
+USER_LIST = """
+    query Users {
+      getAllUsers { id username email profilePicture }
+    }
+"""
+
+
+class Fixtures:
+    def __init__(self, tag: str, category_id: int, email: str):
+        self.tag = tag
+        self.category_id = category_id
+        self.email = email
+        self.products: list = []  # (id, name) rows, in insertion order
+
+
+async def create_fixtures(users: int) -> Fixtures:
+    tag = uuid.uuid4().hex[:8]
+    async with async_session() as db:
+        category = models.DBProductCategory(name=f"bench_{tag}")
+        login_user = models.DBUser(
+            username=f"bench_{tag}",
+            email=f"bench_{tag}@example.com",
+            password=await hash_password(PASSWORD),
+            is_verified=True,
+        )
+        others = [
+            models.DBUser(
+                username=f"bench_{tag}_{index}",
+                email=f"bench_{tag}_{index}@example.com",
+                password="!",
+            )
+            for index in range(users)
+        ]
+        db.add_all([category, login_user, *others])
+        await db.commit()
+        return Fixtures(tag, category.id, login_user.email)
+
+
+async def grow_catalog(fixtures: Fixtures, size: int, rng: random.Random) -> None:
+    async with async_session() as db:
+        while len(fixtures.products) < size:
+            start = len(fixtures.products)
+            rows = (
+                await db.execute(
+                    insert(models.DBProduct).returning(
+                        models.DBProduct.id, models.DBProduct.name
+                    ),
+                    [
+                        {
+                            "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} "
+                            f"{rng.randrange(10**6):06d}",
+                            "description": f"{rng.choice(ADJECTIVES)} gear for "
+                            f"{rng.choice(USES)}, item {start + index}",
+                            "price": rng.randrange(100, 100000) / 100,
+                            "stock": rng.randrange(0, 50),
+                            "category_id": fixtures.category_id,
+                        }
+                        for index in range(min(SEED_CHUNK, size - start))
+                    ],
+                )
+            ).all()
+            links = [f"bench/{fixtures.tag}/{row.id}.jpg" for row in rows]
+            await db.execute(
+                insert(models.DBProductImage),
+                [
+                    {
+                        "link": link,
+                        "content_hash": hashlib.sha256(link.encode()).hexdigest(),
+                        "product_id": row.id,
+                    }
+                    for row, link in zip(rows, links)
+                ],
+            )
+            fixtures.products.extend(rows)
+        await db.commit()
+
+
+async def drop_fixtures(fixtures: Fixtures) -> None:
+    async with async_session() as db:
+        # images go with their products (ON DELETE CASCADE)
+        await db.execute(
+            delete(models.DBProduct).filter(
+                models.DBProduct.category_id == fixtures.category_id
+            )
+        )
+        await db.execute(
+            delete(models.DBProductCategory).filter(
+                models.DBProductCategory.id == fixtures.category_id
+            )
+        )
+        await db.execute(
+            delete(models.DBUser).filter(
+                models.DBUser.username.startswith(
+                    f"bench_{fixtures.tag}", autoescape=True
+                )
+            )
+        )
+        await db.commit()
+
+
+async def log_in(client: httpx.AsyncClient, email: str) -> httpx.Response:
+    return await client.post(
+        "/api/v1/users/login", json={"email": email, "password": PASSWORD}
+    )
+
+
+def failure(response: httpx.Response) -> str | None:
+    """Why the request failed, None when it succeeded."""
+    if response.status_code != 200:
+        return f"HTTP {response.status_code}"
+    if response.url.path == "/graphql" and response.json().get("errors"):
+        return response.json()["errors"][0]["message"]
+    return None
+
+
+async def graphql(client: httpx.AsyncClient, query: str, variables: dict) -> str | None:
+    return failure(
+        await client.post("/graphql", json={"query": query, "variables": variables})
+    )
+
+
+Send = Callable[[], Awaitable[str | None]]
+
+
+def scenarios(
+    client: httpx.AsyncClient, fixtures: Fixtures, token: str, rng: random.Random
+) -> dict[str, Send]:
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def login() -> str | None:
+        return failure(await log_in(client, fixtures.email))
+
+    async def my_profile() -> str | None:
+        return failure(await client.get("/api/v1/users/my-profile", headers=headers))
+
+    async def get_all_products() -> str | None:
+        after = rng.choice(fixtures.products)
+        return await graphql(
+            client,
+            PRODUCT_PAGE,
+            {
+                "first": 20,
+                "after": product_cursor(after),
+                "filters": {"categoryId": fixtures.category_id},
+            },
+        )
+
+    async def search_products() -> str | None:
+        return await graphql(
+            client,
+            PRODUCT_SEARCH,
+            {
+                "query": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}",
+                "first": 20,
+                "filters": {"categoryId": fixtures.category_id},
+            },
+        )
+
+    async def get_all_users() -> str | None:
+        return await graphql(client, USER_LIST, {})
+
+    return {
+        "login": login,
+        "my-profile": my_profile,
+        "getAllProducts": get_all_products,
+        "searchProducts": search_products,
+        "getAllUsers": get_all_users,
+    }
+
+
+async def load(
+    send: Send, seconds: float, concurrency: int
+) -> tuple[list[float], Counter[str], float]:
+    """Latencies and failures of `concurrency` workers calling `send` in a loop."""
+    latencies: list[float] = []
+    failures: Counter[str] = Counter()
+    deadline = time.perf_counter() + seconds
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            reason = await send()
+            latencies.append(time.perf_counter() - started)
+            if reason is not None:
+                failures[reason] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, failures, time.perf_counter() - started
+
+
+def percentile(ordered: list[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return ordered[max(0, math.ceil(len(ordered) * percent / 100) - 1)]
+
+
+def summarize(latencies: list[float], failures: Counter[str], elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    milliseconds = {
+        f"{name}_ms": round(value * 1000, 2)
+        for name, value in (
+            ("mean", sum(ordered) / len(ordered)),
+            ("p50", percentile(ordered, 50)),
+            ("p95", percentile(ordered, 95)),
+            ("p99", percentile(ordered, 99)),
+            ("max", ordered[-1]),
+        )
+    }
+    return {
+        "requests": len(ordered),
+        "errors": sum(failures.values()),
+        "top_error": failures.most_common(1)[0][0] if failures else None,
+        "throughput": round(len(ordered) / elapsed, 1),
+        **milliseconds,
+    }
+
+
+async def run(args) -> dict[str, dict]:
+    rng = random.Random(args.seed)
+    results = {}
+    async with app.router.lifespan_context(app):
+        fixtures = await create_fixtures(args.users)
+        try:
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://benchmark"
+            ) as client:
+                response = await log_in(client, fixtures.email)
+                response.raise_for_status()
+                senders = scenarios(
+                    client, fixtures, response.json()["access_token"], rng
+                )
+                async with async_session() as db:
+                    users = await db.scalar(select(func.count(models.DBUser.id)))
+                print(f"users in the database: {users}")
+                for size in args.sizes:
+                    await grow_catalog(fixtures, size, rng)
+                    for name in args.scenarios:
+                        await load(senders[name], args.warmup, args.concurrency)
+                        summary = summarize(
+                            *await load(senders[name], args.duration, args.concurrency)
+                        )
+                        results[f"{name}@{size}"] = summary
+                        print(
+                            f"{name + '@' + str(size):<24} "
+                            f"{summary['throughput']:>8.1f} req/s  "
+                            f"p50 {summary['p50_ms']:>7.1f}  "
+                            f"p95 {summary['p95_ms']:>7.1f}  "
+                            f"p99 {summary['p99_ms']:>7.1f} ms  "
+                            f"errors {summary['errors']}"
+                        )
+                        if summary["top_error"]:
+                            print(f"    mostly: {summary['top_error']}")
+        finally:
+            await drop_fixtures(fixtures)
+    return results
+
+
+def git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_info(args) -> dict:
+    return {
+        "commit": git("rev-parse", "HEAD") or None,
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        # results are only comparable when these match
+        "settings": {
+            "sizes": args.sizes,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "seed": args.seed,
+            "database": engine.url.render_as_string(hide_password=True),
+            "db_pool_size": DB_POOL_SIZE,
+            "graphql_result_cache": GRAPHQL_RESULT_CACHE,
+        },
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """Print how `current` differs from `baseline` and return the regressions."""
+    print(
+        f"baseline {(baseline.get('commit') or '?')[:12]} -> "
+        f"current {(current.get('commit') or '?')[:12]}"
+    )
+    if baseline.get("settings") != current.get("settings"):
+        print("warning: the runs used different settings, compare with care")
+    regressions = []
+    for key, new in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        p95_change = new["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        throughput_change = (
+            new["throughput"] / old["throughput"] - 1 if old["throughput"] else 0.0
+        )
+        regressed = (
+            p95_change > tolerance
+            or throughput_change < -tolerance
+            or (new["errors"] > 0 and old["errors"] == 0)
+        )
+        print(
+            f"{key:<24} p95 {old['p95_ms']:>7.1f} -> {new['p95_ms']:>7.1f} ms "
+            f"({p95_change:+.0%})  throughput {old['throughput']:>8.1f} -> "
+            f"{new['throughput']:>8.1f} ({throughput_change:+.0%})  "
+            f"errors {old['errors']} -> {new['errors']}"
+            f"{'  <-- REGRESSION' if regressed else ''}"
+        )
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def read_results(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def comma_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="REST and GraphQL load benchmark")
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: sorted({int(size) for size in comma_list(value)}),
+        default=[100, 1000, 10000],
+        help="catalog sizes, comma separated",
+    )
+    parser.add_argument(
+        "--scenarios",
+        type=comma_list,
+        default=list(SCENARIOS),
+        help=f"comma separated subset of {', '.join(SCENARIOS)}",
+    )
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="defaults to benchmarks/results/<commit>.json")
+    parser.add_argument("--baseline", help="results file to compare this run with")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASELINE", "CURRENT"),
+        help="compare two results files without running anything",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed relative change of p95 and throughput (default 0.2)",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = (read_results(path) for path in args.compare)
+        sys.exit(1 if compare(baseline, current, args.tolerance) else 0)
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if not args.sizes or min(args.sizes) < 1:
+        parser.error("catalog sizes must be positive")
+
+    info = run_info(args)
+    current = {**info, "results": asyncio.run(run(args))}
+    output = Path(
+        args.output or RESULTS_DIR / f"{(info['commit'] or 'unknown')[:12]}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(current, indent=2) + "\n")
+    print(f"results written to {output}")
+
+    if args.baseline and compare(read_results(args.baseline), current, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
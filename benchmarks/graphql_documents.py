@@ -0,0 +1,73 @@
+"""Measure what the parsed-document cache and APQ save per GraphQL request.
+
+    python -m benchmarks.graphql_documents [--iterations 2000]
+
+For each storefront query it times parsing plus validation against
+schemas.schema_rooting.schema, and compares that with hits in the schema's
+parser and validation caches, which is all that is left of it per request.
+It also prints the request body size with the full text and with only the
+APQ hash. No database is needed.
+"""
+
+import argparse
+import json
+import time
+
+from graphql import parse, validate
+from graphql.validation import specified_rules
+
+from schemas.extensions import parser_cache, query_hash, validation_cache
+from schemas.schema_rooting import schema
+from schemas.storefront_queries import STOREFRONT_QUERIES
+
+
+def per_call(function, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    graphql_schema = schema._schema
+
+    print(
+        f"{'query':<16} {'parse+validate':>15} {'cache hit':>10} {'speedup':>8}"
+        f" {'body':>7} {'APQ body':>9}"
+    )
+    for name, query in STOREFRONT_QUERIES.items():
+
+        def parse_and_validate():
+            errors = validate(graphql_schema, parse(query))
+            assert not errors, errors
+
+        def cache_hit():
+            document = parser_cache.cached_parse_document(query)
+            errors = validation_cache.cached_validate_document(
+                graphql_schema, document, specified_rules
+            )
+            assert not errors, errors
+
+        cache_hit()
+        uncached = per_call(parse_and_validate, args.iterations)
+        cached = per_call(cache_hit, args.iterations)
+        full_body = json.dumps({"query": query, "variables": {"first": 20}})
+        apq_body = json.dumps(
+            {
+                "variables": {"first": 20},
+                "extensions": {
+                    "persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}
+                },
+            }
+        )
+        print(
+            f"{name:<16} {uncached:>12.1f} us {cached:>7.1f} us {uncached / cached:>7.0f}x"
+            f" {len(full_body):>6}B {len(apq_body):>8}B"
+        )
+
+
+if __name__ == "__main__":
+    main()
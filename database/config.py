@@ -0,0 +1,61 @@
+import os
+from uuid import uuid4
+
+import dotenv
+from sqlalchemy.engine import make_url
+
+from database.metrics import TimedAsyncAdaptedQueuePool
+
+dotenv.load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+DB_ECHO = _env_bool("DB_ECHO", False)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+# transaction-pooling PgBouncer cannot keep prepared statements across queries
+DB_PGBOUNCER = _env_bool("DB_PGBOUNCER", False)
+# statements slower than this are logged, with their plan; 0 disables
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+DB_SLOW_QUERY_EXPLAIN = _env_bool("DB_SLOW_QUERY_EXPLAIN", True)
+# a statement shape run more often than this in one request is logged as N+1
+DB_REPEATED_QUERY_THRESHOLD = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "10"))
+# connections opened at startup, at most the persistent pool size
+DB_POOL_WARMUP = min(int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE))), DB_POOL_SIZE)
+
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments for `create_async_engine` built from the DB_* settings."""
+    options = {"echo": DB_ECHO, "future": True}
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return options  # SQLite picks its own pool class
+    options.update(
+        poolclass=TimedAsyncAdaptedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    if backend == "postgresql":
+        if DB_PGBOUNCER:
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                # unnamed statements may be run on another server connection
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        else:
+            options["connect_args"] = {
+                "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+                "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            }
+    return options
@@ -1,26 +1,141 @@
+import asyncio
+import itertools
+import logging
 import os
+import time
+from contextvars import ContextVar
+
 import dotenv
 from sqlmodel import SQLModel
 
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from database.config import DB_POOL_WARMUP, engine_options
+from database.metrics import instrument_engine
+from database.query_tracker import track_engine
 
 
 dotenv.load_dotenv()
 
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL"
 )  # change if connecting via IDE/docker container
 
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 async_session = sessionmaker(
     bind=engine,
     class_=AsyncSession,
     expire_on_commit=False,
 )
 
+# comma separated; read-only sessions are spread over these round-robin
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+# how long a replica that failed to connect is skipped
+DB_REPLICA_RETRY_AFTER = float(os.getenv("DB_REPLICA_RETRY_AFTER", "30"))
+
+replica_engines = [
+    create_async_engine(url, **engine_options(url)) for url in DATABASE_REPLICA_URLS
+]
+instrument_engine(engine, "primary")
+track_engine(engine)
+for index, replica_engine in enumerate(replica_engines):
+    instrument_engine(replica_engine, f"replica-{index}")
+    track_engine(replica_engine)
+
+replica_sessions = [
+    sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)
+    for replica_engine in replica_engines
+]
+_replica_counter = itertools.count()
+_replica_down_until = [0.0] * len(replica_sessions)
+
+# Set while reads must see every committed write, such as those filling the
+# result cache under the newest tag versions; replicas may lag behind.
+read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+
+def _mark_replica_down(index: int) -> None:
+    _replica_down_until[index] = time.monotonic() + DB_REPLICA_RETRY_AFTER
+    logger.warning("Read replica %s is unreachable, skipping it", index)
+
+
+async def open_read_session() -> AsyncSession:
+    """Session on the next healthy replica, or on the primary when none is reachable
+    or read_from_primary is set."""
+    if read_from_primary.get():
+        return async_session()
+    replicas = len(replica_sessions)
+    start = next(_replica_counter)
+    for offset in range(replicas):
+        index = (start + offset) % replicas
+        if _replica_down_until[index] > time.monotonic():
+            continue
+        session = replica_sessions[index]()
+        try:
+            await session.connection()
+        except (DBAPIError, OSError, asyncio.TimeoutError):
+            await session.close()
+            _mark_replica_down(index)
+            continue
+        return session
+    return async_session()
+
+
+class ReadSession:
+    """Read-only stand-in for an AsyncSession that holds a connection per statement.
+
+    Every statement runs on its own open_read_session(), closed as soon as the
+    (fully buffered) result is in: a request keeps no replica connection
+    checked out between its queries, or at all when it reads nothing. ORM
+    objects come back detached, which read-only code doesn't notice, and
+    statements don't share a snapshot.
+    """
+
+    async def execute(self, statement, params=None, **kwargs):
+        async with await open_read_session() as session:
+            return await session.execute(statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        async with await open_read_session() as session:
+            return await session.scalar(statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return (await self.execute(statement, params, **kwargs)).scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        async with await open_read_session() as session:
+            return await session.get(entity, ident, **kwargs)
+
+
+async def warm_up_pool(engine: AsyncEngine, connections: int = DB_POOL_WARMUP) -> None:
+    """Open `connections` pooled connections up front so requests find them ready."""
+
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # all at once, otherwise the pool hands the same connection back each time
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+
+async def warm_up_replicas() -> None:
+    """warm_up_pool for every replica; one that is unreachable is skipped for now."""
+    for index, replica_engine in enumerate(replica_engines):
+        try:
+            await warm_up_pool(replica_engine)
+        except (DBAPIError, OSError, asyncio.TimeoutError):
+            _mark_replica_down(index)
+
 
 async def init_db():
     async with engine.begin() as conn:
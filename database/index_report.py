@@ -0,0 +1,156 @@
+"""Compare the indexes declared in database/models.py with the columns services query.
+
+    python -m database.index_report [--strict]
+
+A column counts as indexed when it is the leading column of a primary key,
+unique constraint or index, and as partial when it only follows another
+column in a composite index. Columns passed to where/filter/order_by/join in
+services/ that are not indexed, and foreign keys without an index, are
+reported as MISSING; --strict makes those exit with status 1.
+"""
+
+import argparse
+import ast
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from sqlalchemy import Column, Table
+from sqlalchemy.sql.elements import UnaryExpression
+
+from database import models
+
+SERVICES_DIRECTORY = Path(__file__).resolve().parent.parent / "services"
+QUERY_METHODS = {"where", "filter", "filter_by", "order_by", "join", "outerjoin"}
+
+
+def model_columns() -> dict[str, Table]:
+    """Map model class names to their tables."""
+    return {
+        mapper.class_.__name__: mapper.local_table
+        for mapper in models.Base.registry.mappers
+    }
+
+
+def leading_column(expression) -> Column | None:
+    if isinstance(expression, UnaryExpression):  # e.g. name.desc()
+        expression = expression.element
+    return expression if isinstance(expression, Column) else None
+
+
+def declared_indexes(table: Table) -> dict[str, list[str]]:
+    """Leading column name -> names of the indexes that can serve it."""
+    indexed = defaultdict(list)
+    primary_key = list(table.primary_key.columns)
+    if primary_key:
+        indexed[primary_key[0].name].append(table.primary_key.name or "primary key")
+    for constraint in table.constraints:
+        columns = getattr(constraint, "columns", None)
+        if constraint is table.primary_key or not columns:
+            continue
+        if constraint.__class__.__name__ == "UniqueConstraint":
+            indexed[list(columns)[0].name].append(constraint.name or "unique")
+    for index in table.indexes:
+        column = leading_column(index.expressions[0])
+        if column is not None:
+            indexed[column.name].append(index.name)
+    return indexed
+
+
+def secondary_indexes(table: Table) -> dict[str, list[str]]:
+    """Non-leading column name -> composite indexes it appears in."""
+    covered = defaultdict(list)
+    for index in table.indexes:
+        for expression in index.expressions[1:]:
+            column = leading_column(expression)
+            if column is not None:
+                covered[column.name].append(index.name)
+    return covered
+
+
+def queried_columns(
+    tables: dict[str, Table], directory: Path = SERVICES_DIRECTORY
+) -> dict[tuple[str, str], list[str]]:
+    """(table, column) -> "file:line method" for every column used in a query clause."""
+    usages = defaultdict(list)
+    for path in sorted(directory.glob("*.py")):
+        tree = ast.parse(path.read_text(), filename=str(path))
+        for node in ast.walk(tree):
+            if not (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr in QUERY_METHODS
+            ):
+                continue
+            for argument in node.args:
+                for child in ast.walk(argument):
+                    # models.DBProduct.name or DBProduct.name
+                    if not isinstance(child, ast.Attribute):
+                        continue
+                    owner = child.value
+                    owner_name = (
+                        owner.attr
+                        if isinstance(owner, ast.Attribute)
+                        else getattr(owner, "id", None)
+                    )
+                    table = tables.get(owner_name)
+                    if table is None or child.attr not in table.columns:
+                        continue
+                    usages[(table.name, child.attr)].append(
+                        f"{path.name}:{child.lineno} {node.func.attr}"
+                    )
+    return usages
+
+
+def build_report() -> tuple[list[str], int]:
+    tables = model_columns()
+    usages = queried_columns(tables)
+    lines, problems = [], 0
+    for table in sorted(tables.values(), key=lambda table: table.name):
+        indexed = declared_indexes(table)
+        covered = secondary_indexes(table)
+        lines.append(f"{table.name}")
+        for column in table.columns:
+            used_by = usages.get((table.name, column.name), [])
+            indexes = indexed.get(column.name, [])
+            foreign_key = bool(column.foreign_keys)
+            if not used_by and not indexes and not foreign_key:
+                continue
+            if indexes:
+                status = "ok" if used_by or foreign_key else "unused"
+            elif covered.get(column.name) and not foreign_key:
+                status = "partial"
+                indexes = [
+                    f"after the leading column of {name}"
+                    for name in covered[column.name]
+                ]
+            else:
+                status = "MISSING"
+                problems += 1
+            lines.append(
+                f"  {status:<8} {column.name:<20} "
+                f"indexes: {', '.join(indexes) or '-'}"
+                f"{' (foreign key)' if foreign_key else ''}"
+            )
+            for usage in used_by:
+                lines.append(f"           {'':<20} {usage}")
+    return lines, problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="exit with status 1 when a queried column or foreign key has no index",
+    )
+    args = parser.parse_args()
+    lines, problems = build_report()
+    print("\n".join(lines))
+    print(f"\n{problems} column(s) without a usable index")
+    if args.strict and problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""SQL and connection pool metrics, collected through SQLAlchemy events.
+
+Gauges are set from pool events rather than read at scrape time, so that
+they also work when several worker processes share one metrics directory
+(see services/metrics.py).
+"""
+
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+DB_QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+db_queries = Counter(
+    "db_queries_total", "SQL statements executed", ["engine", "statement"]
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds",
+    "Time spent executing SQL statements",
+    ["engine", "statement"],
+    buckets=DB_QUERY_BUCKETS,
+)
+db_pool_size = Gauge(
+    "db_pool_size",
+    "Persistent connections in the pool",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+db_pool_checked_out = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+db_pool_overflow = Gauge(
+    "db_pool_overflow",
+    "Connections open beyond the pool size, negative while the pool is not full",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+db_pool_wait = Histogram(
+    "db_pool_wait_seconds",
+    "Time to get a connection from the pool, including opening a new one",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+
+STATEMENT_TYPES = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY"})
+
+
+def statement_type(statement: str) -> str:
+    words = statement.split(None, 1)
+    keyword = words[0].upper() if words else ""
+    return keyword if keyword in STATEMENT_TYPES else "OTHER"
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """The default pool of async engines, timing how long checkouts wait."""
+
+    metrics_label = "unknown"  # set by instrument_engine()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.labels(self.metrics_label).observe(
+                time.perf_counter() - started
+            )
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Record statement counts and durations and pool usage of `engine` as `name`."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        kind = statement_type(statement)
+        db_queries.labels(name, kind).inc()
+        db_query_duration.labels(name, kind).observe(
+            time.perf_counter() - context._metrics_started
+        )
+
+    pool = sync_engine.pool
+    if isinstance(pool, TimedAsyncAdaptedQueuePool):
+        pool.metrics_label = name
+    if not hasattr(pool, "checkedout"):  # SQLite's pools don't count
+        return
+    db_pool_size.labels(name).set(pool.size())
+
+    def on_checkout(*args) -> None:
+        db_pool_checked_out.labels(name).set(pool.checkedout())
+        db_pool_overflow.labels(name).set(pool.overflow())
+
+    def on_checkin(*args) -> None:
+        # fired before the connection is back in the pool
+        db_pool_checked_out.labels(name).set(pool.checkedout() - 1)
+        db_pool_overflow.labels(name).set(pool.overflow())
+
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
+    db_pool_checked_out.labels(name).set(0)
+    db_pool_overflow.labels(name).set(pool.overflow())
@@ -1,8 +1,20 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, ForeignKey
-from sqlalchemy.dialects.postgresql import ENUM
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    BigInteger,
+    CheckConstraint,
+    Column,
+    FetchedValue,
+    Integer,
+    String,
+    DateTime,
+    Boolean,
+    Float,
+    ForeignKey,
+    Index,
+)
+from sqlalchemy.dialects.postgresql import ENUM, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 from database.engine import Base
 from enum import Enum as PyEnum
@@ -14,6 +26,17 @@ class Role(PyEnum):
     moderator = "moderator"
 
 
+class OrderStatus(PyEnum):
+    placed = "placed"
+    cancelled = "cancelled"
+
+
+class EmailStatus(PyEnum):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"
+
+
 class DBUser(Base):
     __tablename__ = "users"
 
@@ -30,6 +53,7 @@ class DBUser(Base):
     password = Column(String, nullable=False)
     email = Column(String, nullable=False, unique=True)
     profile_picture = Column(String, nullable=False, default="default.jpg")
+    profile_picture_hash = Column(String(length=64), nullable=True)
     role = Column(ENUM(Role), nullable=False, default=Role.user)
     phone_number = Column(String, nullable=True)
     is_verified = Column(Boolean, nullable=False, default=False)
@@ -43,33 +67,25 @@ class DBUser(Base):
 class DBProductImage(Base):
     __tablename__ = "product_images"
 
-    id = Column(
-        Integer,
-        primary_key=True,
-        autoincrement=True,
-        nullable=False,
-        unique=True,
-        index=True,
-    )
+    id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
     link = Column(String, nullable=False)
+    content_hash = Column(String(length=64), nullable=True)
     product_id = Column(
         Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False
     )
     product = relationship("DBProduct", back_populates="images")
 
+    __table_args__ = (
+        # also serves the foreign key; lets imports upsert images
+        Index("ix_product_images_product_id_link", product_id, link, unique=True),
+    )
+
 
 class DBProductCategory(Base):
     __tablename__ = "product_categories"
 
-    id = Column(
-        Integer,
-        primary_key=True,
-        autoincrement=True,
-        nullable=False,
-        unique=True,
-        index=True,
-    )
-    name = Column(String(length=255), nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
+    name = Column(String(length=255), nullable=False, unique=True, index=True)
     description = Column(String(length=500), nullable=True)
     products = relationship("DBProduct", back_populates="category")
 
@@ -77,13 +93,14 @@ class DBProductCategory(Base):
 class DBProduct(Base):
     __tablename__ = "products"
 
-    id = Column(
-        Integer,
-        primary_key=True,
-        autoincrement=True,
-        nullable=False,
+    id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
+    # "P-<id>" from a trigger when none is given (migration 5b1e7c0d9a42)
+    sku = Column(
+        String(length=64),
+        nullable=True,
         unique=True,
         index=True,
+        server_default=FetchedValue(),
     )
     name = Column(String(length=255), nullable=False)
     description = Column(String(length=255), nullable=True)
@@ -92,26 +109,123 @@ class DBProduct(Base):
     stock = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, default=lambda: datetime.utcnow(), nullable=False)
     category_id = Column(Integer, ForeignKey("product_categories.id"), nullable=False)
+    # set by a trigger on name and description (migration c3c065df359a);
+    # deferred so listings never fetch it
+    search_vector = deferred(
+        Column(TSVECTOR, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    )
 
     images = relationship(
         "DBProductImage", back_populates="product", cascade="all, delete-orphan"
     )
     category = relationship("DBProductCategory", back_populates="products")
 
+    __table_args__ = (
+        # keyset pagination order of the product listing
+        Index("ix_products_name_desc_id", name.desc(), id),
+        # category listings, and the foreign key lookup from product_categories
+        Index("ix_products_category_id_name_desc_id", category_id, name.desc(), id),
+        Index("ix_products_search_vector", search_vector, postgresql_using="gin"),
+        # typo-tolerant name matching through pg_trgm
+        Index(
+            "ix_products_name_trgm",
+            name,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        # checkout decrements stock with a conditional UPDATE; this is the backstop
+        CheckConstraint("stock >= 0", name="ck_products_stock_non_negative"),
+    )
+
+
+class DBEmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
+    recipient = Column(String, nullable=False)
+    subject = Column(String(length=255), nullable=False)
+    body = Column(String, nullable=False)
+    subtype = Column(String(length=16), nullable=False, default="plain")
+    status = Column(ENUM(EmailStatus), nullable=False, default=EmailStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(length=500), nullable=True)
+    next_attempt_at = Column(
+        DateTime, default=lambda: datetime.utcnow(), nullable=False
+    )
+    created_at = Column(DateTime, default=lambda: datetime.utcnow(), nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # the dispatcher polls pending rows that are due
+        Index("ix_email_outbox_status_next_attempt_at", status, next_attempt_at),
+    )
+
 
-class Order:
+class DBOrder(Base):
     __tablename__ = "orders"
 
-    id = Column(
+    id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    status = Column(ENUM(OrderStatus), nullable=False, default=OrderStatus.placed)
+    total_price = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.utcnow(), nullable=False)
+
+    items = relationship(
+        "DBOrderItem", back_populates="order", cascade="all, delete-orphan"
+    )
+
+    __table_args__ = (
+        # a user's order history, newest first; also serves the foreign key
+        Index("ix_orders_user_id_created_at", user_id, created_at.desc()),
+    )
+
+
+class DBOrderItem(Base):
+    __tablename__ = "order_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
+    order_id = Column(
+        Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)
+
+    order = relationship("DBOrder", back_populates="items")
+
+    __table_args__ = (CheckConstraint("quantity > 0", name="ck_order_items_quantity"),)
+
+
+class DBCart(Base):
+    """Version of the persisted copy of a cart, see services/cart_service."""
+
+    __tablename__ = "carts"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    version = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.utcnow(), nullable=False)
+
+
+class DBCartItem(Base):
+    """Durable copy of a cart; the live cart is in the cart store (services/cart_service)."""
+
+    __tablename__ = "cart_items"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    product_id = Column(
         Integer,
+        ForeignKey("products.id", ondelete="CASCADE"),
         primary_key=True,
-        autoincrement=True,
-        nullable=False,
-        unique=True,
         index=True,
     )
+    quantity = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.utcnow(), nullable=False)
 
 
-# TODO: need to implement new model for orders
-
 # TODO: code refactoring
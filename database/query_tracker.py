@@ -0,0 +1,174 @@
+"""Per-request SQL tracking: slow-query log and repeated-statement (N+1) detector.
+
+QueryTrackerMiddleware gives every request a QueryTracker; the engine events
+registered by track_engine() record each statement in the tracker of the
+request that ran it. Tasks started by the request (DataLoader batches,
+single-flight reads) inherit it.
+
+- Statements slower than DB_SLOW_QUERY_MS are logged with their EXPLAIN
+  plan (PostgreSQL, when DB_SLOW_QUERY_EXPLAIN is on), request or not.
+- At the end of a request, every statement shape that ran more than
+  DB_REPEATED_QUERY_THRESHOLD times is logged: usually a lazy load or a
+  per-row query in a loop that should be one batched query.
+
+Tests can count statements with assert_num_queries().
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from database.config import (
+    DB_REPEATED_QUERY_THRESHOLD,
+    DB_SLOW_QUERY_EXPLAIN,
+    DB_SLOW_QUERY_MS,
+)
+from database.metrics import statement_type
+
+logger = logging.getLogger(__name__)
+
+# the number of bound parameters in an IN list doesn't change the statement shape
+IN_LIST = re.compile(r"\(\s*\$\d+(?:::\w+)?(?:\s*,\s*\$\d+(?:::\w+)?)*\s*\)")
+EXPLAINABLE = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"})
+
+
+def statement_shape(statement: str) -> str:
+    return IN_LIST.sub("(...)", " ".join(statement.split()))
+
+
+class QueryTracker:
+    def __init__(self, name: str):
+        self.name = name
+        self.shapes: Counter[str] = Counter()
+        self.duration = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.shapes.values())
+
+    def record(self, statement: str, duration: float) -> None:
+        self.shapes[statement_shape(statement)] += 1
+        self.duration += duration
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count > threshold
+        ]
+
+    def report(self, threshold: int = DB_REPEATED_QUERY_THRESHOLD) -> None:
+        if threshold <= 0:
+            return
+        for shape, count in self.repeated(threshold):
+            logger.warning(
+                "Possible N+1: statement ran %s times in %s: %s",
+                count,
+                self.name,
+                shape,
+            )
+
+
+current_query_tracker: ContextVar[QueryTracker | None] = ContextVar(
+    "current_query_tracker", default=None
+)
+
+
+def _explain(connection, statement: str, parameters) -> str:
+    # a cursor of its own: the statement's rows haven't been fetched yet
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN {statement}", parameters)
+        return "\n".join(row[0] for row in cursor.fetchall())
+    except Exception as exc:  # never fail the query being explained
+        return f"(EXPLAIN failed: {exc})"
+    finally:
+        cursor.close()
+
+
+def track_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        context._tracker_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        duration = time.perf_counter() - context._tracker_started
+        tracker = current_query_tracker.get()
+        if tracker is not None:
+            tracker.record(statement, duration)
+        if DB_SLOW_QUERY_MS <= 0 or duration * 1000 < DB_SLOW_QUERY_MS:
+            return
+        plan = ""
+        if (
+            DB_SLOW_QUERY_EXPLAIN
+            and not executemany
+            and not context.execution_options.get("stream_results")
+            and connection.dialect.name == "postgresql"
+            # EXPLAIN of anything else may fail and abort the transaction
+            and statement_type(statement) in EXPLAINABLE
+        ):
+            plan = "\n" + _explain(connection, statement, parameters)
+        logger.warning(
+            "Slow query (%.0f ms) in %s: %s%s",
+            duration * 1000,
+            tracker.name if tracker is not None else "background task",
+            " ".join(statement.split()),
+            plan,
+        )
+
+
+@contextmanager
+def track_queries(name: str) -> Iterator[QueryTracker]:
+    """Record the statements run inside the block, in the outer tracker if any."""
+    tracker = current_query_tracker.get()
+    if tracker is not None:
+        yield tracker
+        return
+    tracker = QueryTracker(name)
+    token = current_query_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        current_query_tracker.reset(token)
+
+
+@contextmanager
+def assert_num_queries(expected: int, exact: bool = True) -> Iterator[QueryTracker]:
+    """Fail unless the block runs `expected` statements, or at most that many.
+
+    Requests sent through httpx's ASGITransport run in the test's context,
+    so this counts what REST and GraphQL endpoints execute:
+
+        with assert_num_queries(1):
+            await client.get("/api/v1/orders", headers=headers)
+        with assert_num_queries(3):
+            await client.post("/graphql", json={"query": PRODUCT_LISTING})
+
+    Turn the GraphQL result cache off (GRAPHQL_RESULT_CACHE=off) or cached
+    operations count zero.
+    """
+    with track_queries("assert_num_queries") as tracker:
+        yield tracker
+    if tracker.count == expected or (not exact and tracker.count <= expected):
+        return
+    statements = "\n".join(
+        f"  {count} x {shape}" for shape, count in tracker.shapes.most_common()
+    )
+    raise AssertionError(
+        f"expected {'' if exact else 'at most '}{expected} queries, "
+        f"ran {tracker.count}:\n{statements}"
+    )
@@ -0,0 +1,35 @@
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from database import models
+from services.auth_service import decode_access_token, get_cached_user
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def get_token_claims(
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+) -> dict:
+    if credentials is None:
+        raise HTTPException(status_code=404, detail="Header is missing")
+    return decode_access_token(credentials.credentials)
+
+
+async def get_current_user(claims: dict = Depends(get_token_claims)) -> models.DBUser:
+    """Cached, read-only user behind the bearer token."""
+    return await get_cached_user(email=claims.get("sub"))
+
+
+async def get_current_admin(
+    current_user: models.DBUser = Depends(get_current_user),
+) -> models.DBUser:
+    if current_user.role != models.Role.admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+
+async def get_context_user(context: dict) -> models.DBUser:
+    """get_current_user for GraphQL resolvers, which have no Depends."""
+    credentials = await bearer_scheme(context["request"])
+    claims = await get_token_claims(credentials)
+    return await get_current_user(claims)
@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Sequence
+
+from aiodataloader import DataLoader
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.product_service import get_categories_by_ids, get_images_by_product_ids
+
+
+def _batch_load_fn(
+    db: AsyncSession,
+    lock: asyncio.Lock,
+    load: Callable[[AsyncSession, Sequence[Any]], Awaitable[list]],
+):
+    # loaders dispatch as separate tasks, but an AsyncSession allows one query at a time
+    async def batch_load(keys: Sequence[Any]) -> list:
+        async with lock:
+            return await load(db, keys)
+
+    return batch_load
+
+
+def get_dataloaders(
+    db: AsyncSession, lock: asyncio.Lock | None = None
+) -> dict[str, DataLoader]:
+    """Per-request loaders, so batches and their caches never outlive the session.
+
+    Pass the lock that root resolvers hold while they use the same session.
+    """
+    lock = lock or asyncio.Lock()
+    return {
+        "category_loader": DataLoader(
+            batch_load_fn=_batch_load_fn(db, lock, get_categories_by_ids)
+        ),
+        "images_loader": DataLoader(
+            batch_load_fn=_batch_load_fn(db, lock, get_images_by_product_ids)
+        ),
+    }
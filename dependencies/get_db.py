@@ -1,7 +1,15 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.engine import async_session
+from database.engine import ReadSession, async_session
 
 
 async def get_db() -> AsyncSession:
     async with async_session() as session:
         yield session
+
+
+async def get_read_db() -> ReadSession:
+    """Session for read-only work, on a replica when one is configured.
+
+    It connects per statement, so requests that never read hold no connection.
+    """
+    return ReadSession()
@@ -1,20 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
-from strawberry.fastapi import GraphQLRouter
-
+from api.body_size_limit import BodySizeLimitMiddleware
+from api.graphql_router import PersistedQueryRouter
+from api.metrics import MetricsMiddleware, router as metrics_router
+from api.query_tracking import QueryTrackerMiddleware
+from api.static_files import UploadsStaticFiles
 from api.v1.user import router as user_router
 from api.v1.product import router as product_router
-from database.engine import engine
-from dependencies.get_db import get_db
+from api.v1.order import router as order_router
+from database.engine import engine, replica_engines, warm_up_pool, warm_up_replicas
+from dependencies.dataloaders import get_dataloaders
+from dependencies.get_db import get_db, get_read_db
 
 
 from sqladmin import Admin
 
 from schemas.schema_rooting import schema
-
-app = FastAPI()
+from services.cart_service import cart_persister, cart_store
+from services.email_service import email_dispatcher
+from services.metrics import event_loop_monitor, mark_worker_exited
+from services.result_cache import result_store
+from services.single_flight import drain_single_flights
+from services import image_service, password_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up_pool(engine)
+    # a replica that is down must not stop the app, reads fall back to the primary
+    await warm_up_replicas()
+    email_dispatcher.start()
+    cart_persister.start()
+    event_loop_monitor.start()
+    yield
+    await event_loop_monitor.stop()
+    await cart_persister.stop()
+    await cart_store.close()
+    await result_store.close()
+    await email_dispatcher.stop()
+    image_service.shutdown_executor()
+    password_service.shutdown_executor()
+    await drain_single_flights()
+    for db_engine in [engine, *replica_engines]:
+        await db_engine.dispose()
+    mark_worker_exited()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 origins = [
@@ -23,6 +59,8 @@ origins = [
 ]
 
 
+# innermost, so that a 413 still gets the CORS headers
+app.add_middleware(BodySizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,  # Set this to your frontend's origin
@@ -31,23 +69,38 @@ app.add_middleware(
     allow_headers=["*"],  # include additional headers as per the application demand
 )
 
+app.add_middleware(QueryTrackerMiddleware)
+# outermost, so the latency includes the other middleware
+app.add_middleware(MetricsMiddleware)
+
 admin = Admin(app, engine)
 
 
+app.include_router(metrics_router)
 app.include_router(user_router, prefix="/api/v1/users")
 app.include_router(product_router, prefix="/api/v1/products")
+app.include_router(order_router, prefix="/api/v1/orders")
 
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", UploadsStaticFiles(directory="uploads"), name="uploads")
 
 
 async def get_context(
     db=Depends(get_db),
+    read_db=Depends(get_read_db),
 ):  # initialized context getter func to use it before every resolver calls
-    return {"db": db}
-
-
-graphql_app = GraphQLRouter(schema=schema, context_getter=get_context)
+    # root fields resolve concurrently; one read at a time keeps each request to
+    # a single read connection
+    read_db_lock = asyncio.Lock()
+    return {
+        "db": db,
+        "read_db": read_db,
+        "read_db_lock": read_db_lock,
+        **get_dataloaders(read_db, read_db_lock),
+    }
+
+
+graphql_app = PersistedQueryRouter(schema=schema, context_getter=get_context)
 
 
 # Add the GraphQL endpoint to FastAPI
@@ -0,0 +1,104 @@
+"""Which GraphQL operations may be served from the result cache, for how long, and
+which writes invalidate them.
+
+An operation is cacheable when it is a query and every root field has an
+entry in CACHE_RULES; anything user-specific (myCart, getAllUsers, ...) is
+simply left out. Nested fields with a rule only shorten the TTL and add
+tags, so a listing that doesn't ask for images is not invalidated by image
+uploads.
+"""
+
+import hashlib
+from typing import NamedTuple
+
+from graphql import (
+    DocumentNode,
+    GraphQLObjectType,
+    GraphQLSchema,
+    OperationDefinitionNode,
+    OperationType,
+    SelectionSetNode,
+    get_named_type,
+    print_ast,
+)
+
+from database.models import DBProduct, DBProductCategory, DBProductImage
+from schemas.cost import collect_fields, document_fragments
+from services.result_cache import MODEL_TAGS
+
+PRODUCTS = MODEL_TAGS[DBProduct]
+CATEGORIES = MODEL_TAGS[DBProductCategory]
+IMAGES = MODEL_TAGS[DBProductImage]
+
+
+class CacheRule(NamedTuple):
+    # seconds; writes invalidate earlier, this bounds staleness from other writers
+    ttl: float
+    tags: tuple[str, ...] = ()
+
+
+# "Type.field" in GraphQL (camelCase) names
+CACHE_RULES: dict[str, CacheRule] = {
+    "Query.getAllProducts": CacheRule(ttl=300, tags=(PRODUCTS,)),
+    "Query.searchProducts": CacheRule(ttl=120, tags=(PRODUCTS,)),
+    "Product.category": CacheRule(ttl=300, tags=(CATEGORIES,)),
+    "Product.images": CacheRule(ttl=300, tags=(IMAGES,)),
+}
+
+
+class CachePolicy(NamedTuple):
+    # sha256 of the printed operation, so formatting doesn't split entries
+    key: str
+    ttl: float
+    tags: tuple[str, ...]
+
+
+class _RuleCollector:
+    def __init__(self, schema: GraphQLSchema, document: DocumentNode):
+        self.schema = schema
+        self.fragments = document_fragments(document)
+        self.ttl = float("inf")
+        self.tags: set[str] = set()
+
+    def visit(self, selection_set: SelectionSetNode | None, parent_type) -> None:
+        if selection_set is None or not isinstance(parent_type, GraphQLObjectType):
+            return
+        for field_node, field_parent in collect_fields(
+            self.schema, self.fragments, selection_set, parent_type
+        ):
+            field_def = field_parent.fields.get(field_node.name.value)
+            if field_def is None:
+                continue
+            rule = CACHE_RULES.get(f"{field_parent.name}.{field_node.name.value}")
+            if rule is not None:
+                self.ttl = min(self.ttl, rule.ttl)
+                self.tags.update(rule.tags)
+            self.visit(field_node.selection_set, get_named_type(field_def.type))
+
+
+def operation_cache_policy(
+    schema: GraphQLSchema,
+    document: DocumentNode,
+    operation: OperationDefinitionNode,
+) -> CachePolicy | None:
+    """None when the operation must not be cached."""
+    if operation.operation != OperationType.QUERY:
+        return None
+    root_type = schema.query_type
+    collector = _RuleCollector(schema, document)
+    root_fields = [
+        field_node.name.value
+        for field_node, _ in collect_fields(
+            schema, collector.fragments, operation.selection_set, root_type
+        )
+        if field_node.name.value != "__typename"
+    ]
+    if not root_fields or any(
+        f"{root_type.name}.{name}" not in CACHE_RULES for name in root_fields
+    ):
+        return None
+    collector.visit(operation.selection_set, root_type)
+    # the operation name picks the operation when the document has several
+    name = operation.name.value if operation.name else ""
+    key = hashlib.sha256(f"{name}\n{print_ast(document)}".encode()).hexdigest()
+    return CachePolicy(key=key, ttl=collector.ttl, tags=tuple(sorted(collector.tags)))
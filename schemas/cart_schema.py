@@ -0,0 +1,72 @@
+import strawberry
+from fastapi import HTTPException
+from graphql import GraphQLError
+
+from dependencies.auth import get_context_user
+from services.cart_service import add_to_cart, clear_cart, get_cart, update_cart_item
+
+
+@strawberry.type
+class CartItem:
+    product_id: int
+    name: str
+    quantity: int
+    unit_price: float
+    line_total: float
+
+
+@strawberry.type
+class Cart:
+    items: list[CartItem]
+    item_count: int
+    total: float
+
+
+def map_cart(cart: dict) -> Cart:
+    return Cart(
+        items=[CartItem(**item) for item in cart["items"]],
+        item_count=cart["item_count"],
+        total=cart["total"],
+    )
+
+
+async def run_for_current_user(info, action, **kwargs) -> Cart:
+    """Run a cart service call for the authenticated user, as a GraphQL error on failure."""
+    try:
+        user = await get_context_user(info.context)
+        cart = await action(db=info.context["db"], user_id=user.id, **kwargs)
+    except HTTPException as exc:
+        raise GraphQLError(exc.detail, extensions={"status": exc.status_code})
+    return map_cart(cart)
+
+
+@strawberry.type
+class Query:
+    @strawberry.field(description="Cart of the authenticated user")
+    async def my_cart(self, info) -> Cart:
+        return await run_for_current_user(info, get_cart)
+
+
+@strawberry.type
+class Mutation:
+    @strawberry.mutation(description="Add units of a product to the cart")
+    async def add_to_cart(self, info, product_id: int, quantity: int = 1) -> Cart:
+        return await run_for_current_user(
+            info, add_to_cart, product_id=product_id, quantity=quantity
+        )
+
+    @strawberry.mutation(description="Set the quantity of a cart line, 0 removes it")
+    async def update_cart_item(self, info, product_id: int, quantity: int) -> Cart:
+        return await run_for_current_user(
+            info, update_cart_item, product_id=product_id, quantity=quantity
+        )
+
+    @strawberry.mutation(description="Remove a product from the cart")
+    async def remove_from_cart(self, info, product_id: int) -> Cart:
+        return await run_for_current_user(
+            info, update_cart_item, product_id=product_id, quantity=0
+        )
+
+    @strawberry.mutation(description="Empty the cart")
+    async def clear_cart(self, info) -> Cart:
+        return await run_for_current_user(info, clear_cart)
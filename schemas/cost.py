@@ -0,0 +1,216 @@
+"""Static cost and depth of a GraphQL operation, computed before it runs.
+
+Every field costs 1 unless FIELD_COSTS says otherwise, and the cost of a
+field's selection is multiplied by the number of items it can return: the
+value of its page-size argument, or an estimated list size for plain lists.
+
+Introspection is charged too, except for `__typename`. One schema query, as
+GraphiQL and code generators send it, walks each list of the schema once,
+so a list of the introspection types costs one item the first time the
+operation selects it and the usual list size every time after that: a
+document that repeats introspection (aliased roots, types nested in types)
+multiplies its cost. `ofType` doesn't add to the depth.
+"""
+
+from typing import Any, NamedTuple
+
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    GraphQLSchema,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    SchemaMetaFieldDef,
+    SelectionSetNode,
+    TypeMetaFieldDef,
+    get_named_type,
+)
+from graphql.execution.values import get_argument_values
+
+from services.cart_service import CART_MAX_ITEMS
+from services.image_service import IMAGE_FORMATS, IMAGE_VARIANTS
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+# items assumed for a list field without a page-size argument or an entry below
+DEFAULT_LIST_SIZE = 10
+PRODUCT_IMAGES_LIST_SIZE = 5
+
+
+class FieldCost(NamedTuple):
+    cost: int = 1
+    # argument that limits how many items the field returns, and its bounds
+    size_argument: str | None = None
+    default_size: int = DEFAULT_LIST_SIZE
+    max_size: int = DEFAULT_LIST_SIZE
+    # items assumed for a list field, when there is no size argument
+    list_size: int | None = None
+
+
+CONNECTION_COST = FieldCost(
+    cost=2,
+    size_argument="first",
+    default_size=DEFAULT_PAGE_SIZE,
+    max_size=MAX_PAGE_SIZE,
+)
+
+# "Type.field" in GraphQL (camelCase) names
+FIELD_COSTS: dict[str, FieldCost] = {
+    "Query.getAllProducts": CONNECTION_COST,
+    "Query.searchProducts": FieldCost(
+        cost=5,  # full-text ranking
+        size_argument="first",
+        default_size=DEFAULT_PAGE_SIZE,
+        max_size=MAX_PAGE_SIZE,
+    ),
+    # already multiplied by the connection's page size
+    "ProductConnection.edges": FieldCost(list_size=1),
+    # a typical product gallery; the field has no page size
+    "Product.images": FieldCost(list_size=PRODUCT_IMAGES_LIST_SIZE),
+    # every rendition of an image, always this many
+    "ProductImage.variants": FieldCost(
+        list_size=len(IMAGE_VARIANTS) * len(IMAGE_FORMATS)
+    ),
+    # Not paginated: every row of the table is returned. Asking for more than
+    # four User fields is over GRAPHQL_MAX_COST, on purpose.
+    "Query.getAllUsers": FieldCost(cost=10, list_size=1000),
+    "Cart.items": FieldCost(list_size=CART_MAX_ITEMS),
+}
+
+
+class OperationCost(NamedTuple):
+    cost: int
+    depth: int
+
+
+def _is_list(graphql_type) -> bool:
+    if isinstance(graphql_type, GraphQLNonNull):
+        graphql_type = graphql_type.of_type
+    return isinstance(graphql_type, GraphQLList)
+
+
+def collect_fields(
+    schema: GraphQLSchema,
+    fragments: dict[str, FragmentDefinitionNode],
+    selection_set: SelectionSetNode,
+    parent_type,
+    visited=(),
+):
+    """Field nodes of a selection set with their parent type, fragments inlined."""
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            yield selection, parent_type
+        elif isinstance(selection, InlineFragmentNode):
+            fragment_type = parent_type
+            if selection.type_condition is not None:
+                fragment_type = schema.get_type(selection.type_condition.name.value)
+            yield from collect_fields(
+                schema, fragments, selection.selection_set, fragment_type, visited
+            )
+        elif isinstance(selection, FragmentSpreadNode):
+            name = selection.name.value
+            fragment = fragments.get(name)
+            if fragment is None or name in visited:  # validation reports these
+                continue
+            yield from collect_fields(
+                schema,
+                fragments,
+                fragment.selection_set,
+                schema.get_type(fragment.type_condition.name.value),
+                (*visited, name),
+            )
+
+
+def document_fragments(document: DocumentNode) -> dict[str, FragmentDefinitionNode]:
+    return {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+
+
+class CostCalculator:
+    def __init__(
+        self,
+        schema: GraphQLSchema,
+        fragments: dict[str, FragmentDefinitionNode],
+        variables: dict[str, Any],
+    ):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables
+        # "Type.field" of the introspection fields selected so far
+        self.introspected: set[str] = set()
+
+    def fields(self, selection_set: SelectionSetNode, parent_type):
+        return collect_fields(self.schema, self.fragments, selection_set, parent_type)
+
+    def field_definition(self, parent_type: GraphQLObjectType, name: str):
+        # the introspection roots are not in the query type's own fields
+        if parent_type is self.schema.query_type:
+            if name == "__schema":
+                return SchemaMetaFieldDef
+            if name == "__type":
+                return TypeMetaFieldDef
+        return parent_type.fields.get(name)
+
+    def multiplier(self, field_node: FieldNode, field_def, config: FieldCost) -> int:
+        if config.size_argument is not None:
+            try:
+                arguments = get_argument_values(field_def, field_node, self.variables)
+            except GraphQLError:  # bad variables fail execution anyway
+                return config.max_size
+            size = arguments.get(config.size_argument)
+            if size is None:
+                return config.default_size
+            return max(0, min(int(size), config.max_size))
+        if _is_list(field_def.type):
+            return (
+                config.list_size if config.list_size is not None else DEFAULT_LIST_SIZE
+            )
+        return 1
+
+    def selection_cost(
+        self, selection_set: SelectionSetNode | None, parent_type, depth: int
+    ) -> OperationCost:
+        if selection_set is None or not isinstance(parent_type, GraphQLObjectType):
+            return OperationCost(0, depth)
+        total, max_depth = 0, depth
+        for field_node, field_parent in self.fields(selection_set, parent_type):
+            name = field_node.name.value
+            if name == "__typename":
+                continue
+            field_def = self.field_definition(field_parent, name)
+            if field_def is None:  # validation reports unknown fields
+                continue
+            key = f"{field_parent.name}.{name}"
+            config = FIELD_COSTS.get(key, FieldCost())
+            multiplier = self.multiplier(field_node, field_def, config)
+            if field_parent.name.startswith("__") and key not in self.introspected:
+                self.introspected.add(key)
+                multiplier = 1
+            children = self.selection_cost(
+                field_node.selection_set,
+                get_named_type(field_def.type),
+                # a type reference is a chain of wrappers, one level each
+                depth if key == "__Type.ofType" else depth + 1,
+            )
+            total += config.cost + multiplier * children.cost
+            max_depth = max(max_depth, children.depth)
+        return OperationCost(total, max_depth)
+
+
+def operation_cost(
+    schema: GraphQLSchema,
+    document: DocumentNode,
+    operation: OperationDefinitionNode,
+    variables: dict[str, Any] | None,
+) -> OperationCost:
+    root_type = schema.get_root_type(operation.operation)
+    calculator = CostCalculator(schema, document_fragments(document), variables or {})
+    return calculator.selection_cost(operation.selection_set, root_type, 0)
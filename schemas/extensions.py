@@ -0,0 +1,233 @@
+import hashlib
+import os
+import time
+from typing import AsyncIterator, Iterable, Iterator
+
+from dotenv import load_dotenv
+from graphql import ExecutionResult as GraphQLExecutionResult
+from graphql import GraphQLError, OperationDefinitionNode, get_operation_ast, parse
+from strawberry.extensions import ParserCache, SchemaExtension, ValidationCache
+
+from database.engine import read_from_primary
+from database.query_tracker import current_query_tracker
+from schemas.cache_policy import CachePolicy, operation_cache_policy
+from schemas.cost import OperationCost, operation_cost
+from schemas.storefront_queries import STOREFRONT_QUERIES
+from services.cache import TTLCache
+from services.metrics import graphql_operation_duration
+from services.result_cache import result_store
+
+load_dotenv()
+
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.getenv("GRAPHQL_DOCUMENT_CACHE_SIZE", "500"))
+GRAPHQL_DOCUMENT_CACHE_TTL = float(os.getenv("GRAPHQL_DOCUMENT_CACHE_TTL", "86400"))
+GRAPHQL_MAX_DEPTH = int(os.getenv("GRAPHQL_MAX_DEPTH", "10"))
+GRAPHQL_MAX_COST = int(os.getenv("GRAPHQL_MAX_COST", "5000"))
+GRAPHQL_MAX_INFLIGHT_COST = int(os.getenv("GRAPHQL_MAX_INFLIGHT_COST", "100000"))
+GRAPHQL_MAX_BODY_SIZE = int(os.getenv("GRAPHQL_MAX_BODY_SIZE", str(256 * 1024)))
+
+# Strawberry's LRU caches of parsed documents, by query text, and of their
+# validation errors, by document. They keep no per-request state, so unlike
+# the extensions below they are added to the schema as these instances.
+parser_cache = ParserCache(maxsize=GRAPHQL_DOCUMENT_CACHE_SIZE)
+validation_cache = ValidationCache(maxsize=GRAPHQL_DOCUMENT_CACHE_SIZE)
+# (query hash, operation name) -> CachePolicy, or NOT_CACHEABLE
+cache_policies = TTLCache(
+    maxsize=GRAPHQL_DOCUMENT_CACHE_SIZE, ttl=GRAPHQL_DOCUMENT_CACHE_TTL
+)
+NOT_CACHEABLE = object()
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+# Operation names that label metrics. Clients pick names freely, so any other
+# is reported as "other" to keep the number of series bounded.
+metric_operation_names: set[str] = set()
+
+
+def register_metric_operations(queries: Iterable[str]) -> None:
+    """Label metrics with the names of the operations in these documents."""
+    for query in queries:
+        for definition in parse(query).definitions:
+            if isinstance(definition, OperationDefinitionNode) and definition.name:
+                metric_operation_names.add(definition.name.value)
+
+
+register_metric_operations(STOREFRONT_QUERIES.values())
+
+
+class QueryCostLimiter(SchemaExtension):
+    """Reject operations that are too deep or too expensive before any resolver runs.
+
+    Also sheds load: an operation is turned away while the cost of the
+    operations already running on this worker would exceed
+    GRAPHQL_MAX_INFLIGHT_COST (0 disables this).
+    """
+
+    inflight_cost = 0
+
+    def __init__(self, *, execution_context=None):
+        super().__init__(execution_context=execution_context)
+        self.cost: OperationCost | None = None
+
+    def on_execute(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        if execution_context.result is not None:  # answered from the result cache
+            yield
+            return
+        operation = get_operation_ast(
+            execution_context.graphql_document, execution_context.operation_name
+        )
+        if operation is None:  # graphql-core reports the unknown operation
+            yield
+            return
+        self.cost = operation_cost(
+            execution_context.schema._schema,
+            execution_context.graphql_document,
+            operation,
+            execution_context.variables,
+        )
+        error = None
+        if self.cost.depth > GRAPHQL_MAX_DEPTH:
+            error = GraphQLError(
+                f"Query depth {self.cost.depth} exceeds the maximum of "
+                f"{GRAPHQL_MAX_DEPTH}",
+                extensions={"code": "QUERY_TOO_DEEP"},
+            )
+        elif self.cost.cost > GRAPHQL_MAX_COST:
+            error = GraphQLError(
+                f"Query cost {self.cost.cost} exceeds the maximum of {GRAPHQL_MAX_COST}",
+                extensions={"code": "QUERY_TOO_EXPENSIVE"},
+            )
+        elif (
+            GRAPHQL_MAX_INFLIGHT_COST
+            and QueryCostLimiter.inflight_cost > 0
+            and QueryCostLimiter.inflight_cost + self.cost.cost
+            > GRAPHQL_MAX_INFLIGHT_COST
+        ):
+            error = GraphQLError(
+                "Server is busy, retry later", extensions={"code": "SERVER_BUSY"}
+            )
+        if error is not None:
+            # a preset result makes Strawberry skip execution
+            execution_context.result = GraphQLExecutionResult(data=None, errors=[error])
+            yield
+            return
+        QueryCostLimiter.inflight_cost += self.cost.cost
+        try:
+            yield
+        finally:
+            QueryCostLimiter.inflight_cost -= self.cost.cost
+
+    def get_results(self) -> dict:
+        if self.cost is None:
+            return {}
+        return {
+            "cost": {
+                "requested": self.cost.cost,
+                "maximum": GRAPHQL_MAX_COST,
+                "depth": self.cost.depth,
+                "maxDepth": GRAPHQL_MAX_DEPTH,
+            }
+        }
+
+
+class ResultCache(SchemaExtension):
+    """Answer cacheable queries (see schemas.cache_policy) from services.result_cache.
+
+    Entries are keyed by the printed operation, its variables and the
+    versions of the tags it depends on. Must come before QueryCostLimiter,
+    so that hits neither count towards nor wait for the in-flight cost.
+    """
+
+    def __init__(self, *, execution_context=None):
+        super().__init__(execution_context=execution_context)
+        self.hit: bool | None = None
+
+    def policy(self) -> CachePolicy | None:
+        execution_context = self.execution_context
+        key = (query_hash(execution_context.query), execution_context.operation_name)
+        policy = cache_policies.get(key)
+        if policy is None:
+            operation = get_operation_ast(
+                execution_context.graphql_document, execution_context.operation_name
+            )
+            if operation is not None:
+                policy = operation_cache_policy(
+                    execution_context.schema._schema,
+                    execution_context.graphql_document,
+                    operation,
+                )
+            policy = policy or NOT_CACHEABLE
+            cache_policies.set(key, policy)
+        return None if policy is NOT_CACHEABLE else policy
+
+    async def on_execute(self) -> AsyncIterator[None]:
+        execution_context = self.execution_context
+        policy = self.policy() if result_store.enabled else None
+        if policy is None or execution_context.result is not None:
+            yield
+            return
+        key = await result_store.key(
+            policy.key, execution_context.variables, policy.tags
+        )
+        if key is None:
+            yield
+            return
+        data = await result_store.get(key)
+        if data is not None:
+            self.hit = True
+            execution_context.result = GraphQLExecutionResult(data=data, errors=None)
+            yield
+            return
+        self.hit = False
+        # a lagging replica could fill the entry with data older than its versions
+        token = read_from_primary.set(True)
+        try:
+            yield
+        finally:
+            read_from_primary.reset(token)
+        result = execution_context.result
+        if result is not None and result.data is not None and not result.errors:
+            await result_store.set(key, result.data, policy.ttl)
+
+    def get_results(self) -> dict:
+        if self.hit is None:
+            return {}
+        return {"resultCache": {"hit": self.hit}}
+
+
+class OperationMetrics(SchemaExtension):
+    """Record the latency of every operation by name, cached and rejected ones too.
+
+    Only names in metric_operation_names are used as labels (see above).
+
+    Also names the request's query tracker after the operation, so slow and
+    repeated statements are reported against it rather than POST /graphql.
+    """
+
+    def on_operation(self) -> Iterator[None]:
+        started = time.perf_counter()
+        yield
+        execution_context = self.execution_context
+        try:
+            operation_type = execution_context.operation_type.value
+        except Exception:  # the document didn't parse or has no such operation
+            operation_type = "invalid"
+        operation_name = execution_context.operation_name
+        if operation_name is None:
+            operation_name = "anonymous"
+        elif operation_name not in metric_operation_names:
+            operation_name = "other"
+        graphql_operation_duration.labels(operation_name, operation_type).observe(
+            time.perf_counter() - started
+        )
+
+    def on_execute(self) -> Iterator[None]:
+        # the operation name is known once the document is parsed
+        tracker = current_query_tracker.get()
+        if tracker is not None and self.execution_context.operation_name:
+            tracker.name += f" {self.execution_context.operation_name}"
+        yield
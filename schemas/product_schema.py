@@ -2,8 +2,23 @@ from datetime import datetime
 
 import strawberry
 
-from database.models import DBProduct
-from services.product_service import get_all_products
+from database.models import DBProductCategory, DBProductImage
+from schemas.selection import selected_columns, selected_field_names
+from services.image_service import variant_urls
+from services.pagination import clamp_page_size, decode_cursor, encode_cursor
+from services.product_service import (
+    ProductRow,
+    get_all_products_shared,
+    search_products,
+)
+
+
+@strawberry.type
+class ImageVariant:
+    name: str
+    format: str
+    width: int
+    url: str
 
 
 @strawberry.type
@@ -11,6 +26,11 @@ class ProductImage:
     id: int
     link: str
     product_id: int
+    content_hash: strawberry.Private[str | None]
+
+    @strawberry.field(description="Resized renditions, empty for legacy images")
+    def variants(self) -> list[ImageVariant]:
+        return [ImageVariant(**variant) for variant in variant_urls(self.content_hash)]
 
 
 @strawberry.type
@@ -20,6 +40,23 @@ class ProductCategory:
     description: str
 
 
+def map_category(category: DBProductCategory) -> ProductCategory:
+    return ProductCategory(
+        id=category.id,
+        name=category.name,
+        description=category.description,
+    )
+
+
+def map_image(image: DBProductImage) -> ProductImage:
+    return ProductImage(
+        id=image.id,
+        link=image.link,
+        product_id=image.product_id,
+        content_hash=image.content_hash,
+    )
+
+
 @strawberry.type
 class Product:
     id: int
@@ -29,42 +66,169 @@ class Product:
     discount_price: float | None
     stock: int
     created_at: datetime
-    category: "ProductCategory"
-    images: list[ProductImage]
-
-
-async def map_product(product: DBProduct) -> Product:
-    return Product(
-        id=product.id,
-        name=product.name,
-        description=product.description,
-        price=product.price,
-        discount_price=product.discount_price,
-        stock=product.stock,
-        created_at=product.created_at,
-        category=ProductCategory(
-            id=product.category.id,
-            name=product.category.name,
-            description=product.category.description,
+    category_id: strawberry.Private[int]
+
+    @strawberry.field
+    async def category(self, info) -> ProductCategory:
+        category = await info.context["category_loader"].load(self.category_id)
+        return map_category(category)
+
+    @strawberry.field
+    async def images(self, info) -> list[ProductImage]:
+        images = await info.context["images_loader"].load(self.id)
+        return [map_image(image) for image in images]
+
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    has_previous_page: bool
+    start_cursor: str | None
+    end_cursor: str | None
+
+
+@strawberry.type
+class ProductEdge:
+    cursor: str
+    node: Product
+
+
+@strawberry.type
+class ProductConnection:
+    edges: list[ProductEdge]
+    page_info: PageInfo
+
+
+@strawberry.input
+class ProductFilter:
+    category_id: int | None = None
+    min_price: float | None = None
+    max_price: float | None = None
+    in_stock: bool | None = None
+
+
+# Product fields (GraphQL names) -> the product columns they read
+PRODUCT_FIELD_COLUMNS = {
+    "description": ("description",),
+    "price": ("price",),
+    "discountPrice": ("discount_price",),
+    "stock": ("stock",),
+    "createdAt": ("created_at",),
+    "category": ("category_id",),
+}
+# always selected: the id for images and the cursors, the name for the listing cursor
+PRODUCT_KEY_COLUMNS = ("id", "name")
+
+
+def product_columns(info) -> tuple[str, ...]:
+    """Columns the nodes of a ProductConnection need for this query."""
+    return selected_columns(
+        selected_field_names(info, "edges", "node"),
+        PRODUCT_FIELD_COLUMNS,
+        PRODUCT_KEY_COLUMNS,
+    )
+
+
+def product_cursor(product: ProductRow) -> str:
+    return encode_cursor([product.name, product.id])
+
+
+def build_connection(
+    edges: list[ProductEdge], has_next_page: bool, has_previous_page: bool
+) -> ProductConnection:
+    return ProductConnection(
+        edges=edges,
+        page_info=PageInfo(
+            has_next_page=has_next_page,
+            has_previous_page=has_previous_page,
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
         ),
-        images=[
-            ProductImage(
-                id=image.id,
-                link=image.link,
-                product_id=image.product_id,
-            )
-            for image in product.images
-        ],
     )
 
 
 @strawberry.type
 class Query:
-    @strawberry.field(graphql_type=list[Product], description="Get all products")
-    async def get_all_products(self, info) -> list[Product]:
-        db = info.context["db"]
-        db_all_products = await get_all_products(db=db)
-        return [await map_product(product=product) for product in db_all_products]
+    @strawberry.field(
+        graphql_type=ProductConnection, description="Get all products, paginated"
+    )
+    async def get_all_products(
+        self,
+        info,
+        first: int | None = None,
+        after: str | None = None,
+        filters: ProductFilter | None = None,
+    ) -> ProductConnection:
+        page_size = clamp_page_size(first)
+        after_key = None
+        if after is not None:
+            after_name, after_id = decode_cursor(after)
+            after_key = (str(after_name), int(after_id))
+        filters = filters or ProductFilter()
+        # identical concurrent listings share one query on their own session
+        db_products = await get_all_products_shared(
+            first=page_size,
+            after=after_key,
+            columns=product_columns(info),
+            category_id=filters.category_id,
+            min_price=filters.min_price,
+            max_price=filters.max_price,
+            in_stock=filters.in_stock,
+        )
+        # the rows resolve as Product directly, without copying into Product objects
+        edges = [
+            ProductEdge(cursor=product_cursor(product), node=product)
+            for product in db_products[:page_size]
+        ]
+        return build_connection(
+            edges=edges,
+            has_next_page=len(db_products) > page_size,
+            has_previous_page=after is not None,
+        )
+
+    @strawberry.field(
+        graphql_type=ProductConnection,
+        description="Full-text product search, best match first",
+    )
+    async def search_products(
+        self,
+        info,
+        query: str,
+        filters: ProductFilter | None = None,
+        first: int | None = None,
+        after: str | None = None,
+    ) -> ProductConnection:
+        db = info.context["read_db"]
+        query = query.strip()
+        if not query:
+            raise ValueError("`query` must not be empty")
+        page_size = clamp_page_size(first)
+        after_key = None
+        if after is not None:
+            after_rank, after_id = decode_cursor(after)
+            after_key = (float(after_rank), int(after_id))
+        filters = filters or ProductFilter()
+        async with info.context["read_db_lock"]:
+            db_results = await search_products(
+                db=db,
+                query_text=query,
+                first=page_size,
+                after=after_key,
+                columns=product_columns(info),
+                category_id=filters.category_id,
+                min_price=filters.min_price,
+                max_price=filters.max_price,
+                in_stock=filters.in_stock,
+            )
+        edges = [
+            ProductEdge(cursor=encode_cursor([rank, product.id]), node=product)
+            for product, rank in db_results[:page_size]
+        ]
+        return build_connection(
+            edges=edges,
+            has_next_page=len(db_results) > page_size,
+            has_previous_page=after is not None,
+        )
 
 
 product_schema = strawberry.Schema(query=Query)
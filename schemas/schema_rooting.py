@@ -1,11 +1,36 @@
 import strawberry
+from schemas.extensions import (
+    OperationMetrics,
+    QueryCostLimiter,
+    ResultCache,
+    parser_cache,
+    validation_cache,
+)
 from schemas.user_schema import Query as UserQuery
 from schemas.product_schema import Query as ProductQuery
+from schemas.cart_schema import Query as CartQuery, Mutation as CartMutation
 
 
 @strawberry.type
-class Query(UserQuery, ProductQuery):
+class Query(UserQuery, ProductQuery, CartQuery):
     pass
 
 
-schema = strawberry.Schema(query=Query)
+@strawberry.type
+class Mutation(CartMutation):
+    pass
+
+
+# extension classes, not instances: instances are shared between requests.
+# The document caches are the exception, they only hold the cache.
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    extensions=[
+        OperationMetrics,
+        parser_cache,
+        validation_cache,
+        ResultCache,
+        QueryCostLimiter,
+    ],
+)
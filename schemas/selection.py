@@ -0,0 +1,46 @@
+"""Which fields of a GraphQL type a query asks for, so resolvers can select only those columns."""
+
+from typing import Iterable, Mapping, Sequence
+
+from strawberry.types.nodes import FragmentSpread, InlineFragment, SelectedField
+
+
+def _fields(selections: Iterable) -> Iterable[SelectedField]:
+    """Selected fields with fragment spreads and inline fragments flattened."""
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            yield selection
+        elif isinstance(selection, (FragmentSpread, InlineFragment)):
+            yield from _fields(selection.selections)
+
+
+def selected_field_names(info, *path: str) -> set[str]:
+    """GraphQL names of the fields selected below the current field, following `path`.
+
+    `selected_field_names(info, "edges", "node")` on a connection resolver
+    gives the fields asked for on each node. Aliases and repeated fields are merged.
+    """
+    selections = [
+        child for field in info.selected_fields for child in _fields(field.selections)
+    ]
+    for name in path:
+        selections = [
+            child
+            for field in _fields(selections)
+            if field.name == name
+            for child in field.selections
+        ]
+    return {field.name for field in _fields(selections)}
+
+
+def selected_columns(
+    selected: set[str],
+    field_columns: Mapping[str, Sequence[str]],
+    key_columns: Sequence[str],
+) -> tuple[str, ...]:
+    """`key_columns` plus the columns needed by the selected fields, in a stable order."""
+    columns = list(key_columns)
+    for field, needed in field_columns.items():
+        if field in selected:
+            columns.extend(column for column in needed if column not in columns)
+    return tuple(columns)
@@ -0,0 +1,36 @@
+"""The documents the storefront sends most, as it sends them.
+
+The benchmarks time them, and tests/test_query_cost.py checks that they fit
+within GRAPHQL_MAX_COST; keep them in step with the storefront.
+"""
+
+STOREFRONT_QUERIES = {
+    "product listing": """
+        query Products($first: Int!, $after: String, $filters: ProductFilter) {
+          getAllProducts(first: $first, after: $after, filters: $filters) {
+            edges {
+              cursor
+              node {
+                id name description price discountPrice stock createdAt
+                category { id name }
+                images { id link variants { name format width url } }
+              }
+            }
+            pageInfo { hasNextPage hasPreviousPage }
+          }
+        }
+    """,
+    "product search": """
+        query Search($query: String!, $first: Int!) {
+          searchProducts(query: $query, first: $first) {
+            edges { node { id name price images { link } } }
+            pageInfo { hasNextPage }
+          }
+        }
+    """,
+    "cart": """
+        query Cart {
+          myCart { items { productId name quantity unitPrice lineTotal } itemCount total }
+        }
+    """,
+}
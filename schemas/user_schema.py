@@ -5,10 +5,11 @@ import pytz
 import strawberry
 from fastapi import HTTPException
 
+from schemas.selection import selected_columns, selected_field_names
 from serializers.user_serializer import UserCreate, Token, LoginInput
 from services.user_service import (
     get_all_users,
-    get_user_by_id,
+    get_user_by_id_shared,
     register_view,
     login_view,
     create_access_token,
@@ -49,33 +50,35 @@ class Token:
     token_type: str
 
 
-async def map_user(found_user) -> User:
-    """Helper function to map a database user object to the User type."""
-    return User(
-        id=found_user.id,
-        username=found_user.username,
-        email=found_user.email,
-        profile_picture=found_user.profile_picture,
-        role=found_user.role,
-        phone_number=found_user.phone_number,
-        is_verified=found_user.is_verified,
-        created_at=found_user.created_at,
-    )
+# User fields (GraphQL names) -> the user columns they read
+USER_FIELD_COLUMNS = {
+    "username": ("username",),
+    "email": ("email",),
+    "profilePicture": ("profile_picture",),
+    "role": ("role",),
+    "phoneNumber": ("phone_number",),
+    "isVerified": ("is_verified",),
+    "createdAt": ("created_at",),
+}
+
+
+def user_columns(info) -> tuple[str, ...]:
+    """Columns the selected User fields need; the user services return rows that
+    resolve as User directly."""
+    return selected_columns(selected_field_names(info), USER_FIELD_COLUMNS, ("id",))
 
 
 @strawberry.type
 class Query:
     @strawberry.field(graphql_type=list[User], description="List of users")
     async def get_all_users(self, info) -> list[User]:
-        db = info.context["db"]
-        db_users = await get_all_users(db=db)
-        return [await map_user(found_user=user) for user in db_users]
+        db = info.context["read_db"]
+        async with info.context["read_db_lock"]:
+            return await get_all_users(db=db, columns=user_columns(info))
 
     @strawberry.field(graphql_type=User, description="Get user by id")
     async def get_user_by_id(self, user_id: int, info) -> User:
-        db = info.context["db"]
-        found_user = await get_user_by_id(db=db, user_id=user_id)
-        return await map_user(found_user=found_user)
+        return await get_user_by_id_shared(user_id=user_id, columns=user_columns(info))
 
 
 # @strawberry.type
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+from database.models import OrderStatus
+
+
+class OrderItemInput(BaseModel):
+    product_id: int
+    quantity: int = Field(gt=0, le=1000)
+
+
+class OrderCreate(BaseModel):
+    items: list[OrderItemInput] = Field(min_length=1, max_length=100)
+
+
+class OrderItem(BaseModel):
+    product_id: int
+    quantity: int
+    unit_price: float
+
+
+class Order(BaseModel):
+    id: int
+    status: OrderStatus
+    total_price: float
+    created_at: datetime
+    items: list[OrderItem]
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field, computed_field
+
+from serializers.user_serializer import ImageVariant
+from services.image_service import variant_urls
+
+
+class ProductImage(BaseModel):
+    id: int
+    product_id: int
+    link: str
+    content_hash: str | None = Field(default=None, exclude=True)
+
+    @computed_field
+    @property
+    def variants(self) -> list[ImageVariant]:
+        return [ImageVariant(**variant) for variant in variant_urls(self.content_hash)]
@@ -1,6 +1,8 @@
 from datetime import datetime
 
-from pydantic import BaseModel, Field, model_validator, EmailStr
+from pydantic import BaseModel, Field, model_validator, EmailStr, computed_field
+
+from services.image_service import variant_urls
 
 
 class UserCreate(BaseModel):
@@ -39,14 +41,30 @@ class EmailVerification(BaseModel):
     message: str
 
 
+class ImageVariant(BaseModel):
+    name: str
+    format: str
+    width: int
+    url: str
+
+
 class MyProfile(BaseModel):
     username: str
     email: str
     bio: str | None
     created_at: datetime
     profile_picture: str
+    profile_picture_hash: str | None = Field(default=None, exclude=True)
     phone_number: str | None
 
+    @computed_field
+    @property
+    def profile_picture_variants(self) -> list[ImageVariant]:
+        return [
+            ImageVariant(**variant)
+            for variant in variant_urls(self.profile_picture_hash)
+        ]
+
 
 # TODO: add new schemas for future update
 
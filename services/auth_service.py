@@ -0,0 +1,73 @@
+import os
+import time
+
+import jwt
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from database import models
+from database.engine import async_session
+from services.cache import TTLCache
+from services.single_flight import SingleFlight
+
+load_dotenv()
+
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = os.getenv("ALGORITHM")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+
+# access token -> decoded claims, kept until the token itself expires
+claims_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=0)
+# `sub` claim (the user's email) -> detached DBUser snapshot
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+
+def decode_access_token(access_token: str) -> dict:
+    claims = claims_cache.get(access_token)
+    if claims is not None:
+        return claims
+    try:
+        claims = jwt.decode(jwt=access_token, key=SECRET_KEY, algorithms=ALGORITHM)
+    except jwt.exceptions.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Access token has expired")
+    except jwt.exceptions.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid access token")
+    if "exp" in claims:
+        claims_cache.set(access_token, claims, ttl=claims["exp"] - time.time())
+    return claims
+
+
+user_by_email_flight = SingleFlight("get_user_by_email")
+
+
+async def load_detached_user(email: str) -> models.DBUser:
+    async with async_session() as db:
+        query = await db.execute(
+            select(models.DBUser).filter(models.DBUser.email == email)
+        )
+        user = query.scalars().first()
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        db.expunge(user)
+    return user
+
+
+async def get_cached_user(email: str) -> models.DBUser:
+    """Read-only user record for `email`, served from the cache for a few seconds.
+
+    The instance is detached and shared; load the user again before changing
+    it. Concurrent misses for one email share a single query.
+    """
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+    user = await user_by_email_flight.do(email, lambda: load_detached_user(email))
+    user_cache.set(email, user)
+    return user
+
+
+def invalidate_cached_user(email: str) -> None:
+    user_cache.pop(email)
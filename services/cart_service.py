@@ -0,0 +1,476 @@
+"""Shopping carts kept in a key-value store and written behind to Postgres.
+
+Every cart change only touches the store (Redis when REDIS_URL is set, an
+in-process dict otherwise) and marks the cart dirty. `CartPersister` copies
+dirty carts to the cart_items table in batches every CART_FLUSH_INTERVAL
+seconds, and a cart missing from the store is loaded back from there.
+
+Every change also bumps the cart's version, which is persisted in the carts
+table. A flush only writes a snapshot newer than the persisted one, so a slow
+worker can't overwrite a cart with an older copy than another worker wrote.
+"""
+
+import asyncio
+import logging
+import os
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from redis import asyncio as redis
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import models
+from database.engine import async_session
+from services.cache import TTLCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+CART_STORE = os.getenv("CART_STORE") or ("redis" if REDIS_URL else "memory")
+CART_TTL_SECONDS = int(os.getenv("CART_TTL_SECONDS", str(30 * 24 * 3600)))
+CART_FLUSH_INTERVAL = float(os.getenv("CART_FLUSH_INTERVAL", "2"))
+CART_FLUSH_BATCH_SIZE = int(os.getenv("CART_FLUSH_BATCH_SIZE", "500"))
+CART_MAX_QUANTITY = int(os.getenv("CART_MAX_QUANTITY", "1000"))
+CART_MAX_ITEMS = int(os.getenv("CART_MAX_ITEMS", "100"))
+PRICE_CACHE_TTL_SECONDS = float(os.getenv("PRICE_CACHE_TTL_SECONDS", "60"))
+
+# Carts are dicts of product id -> quantity throughout; get_many() returns
+# (cart, version) pairs.
+
+
+class MemoryCartStore:
+    """Per-process store for development and tests; not shared between workers."""
+
+    def __init__(self):
+        self._carts: dict[int, dict[int, int]] = {}
+        self._versions: dict[int, int] = {}
+        self._dirty: set[int] = set()
+
+    async def get(self, user_id: int) -> dict[int, int] | None:
+        cart = self._carts.get(user_id)
+        return None if cart is None else dict(cart)
+
+    async def get_many(
+        self, user_ids: list[int]
+    ) -> list[tuple[dict[int, int], int] | None]:
+        return [
+            (
+                (dict(self._carts[user_id]), self._versions[user_id])
+                if user_id in self._carts
+                else None
+            )
+            for user_id in user_ids
+        ]
+
+    async def load(
+        self, user_id: int, cart: dict[int, int], version: int, dirty: bool = False
+    ):
+        self._carts[user_id] = dict(cart)
+        self._versions[user_id] = version
+        if dirty:
+            self._dirty.add(user_id)
+
+    async def increment(self, user_id: int, product_id: int, quantity: int) -> int:
+        cart = self._carts.setdefault(user_id, {})
+        cart[product_id] = cart.get(product_id, 0) + quantity
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self._dirty.add(user_id)
+        return cart[product_id]
+
+    async def set_quantity(self, user_id: int, product_id: int, quantity: int) -> None:
+        cart = self._carts.setdefault(user_id, {})
+        if quantity > 0:
+            cart[product_id] = quantity
+        else:
+            cart.pop(product_id, None)
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self._dirty.add(user_id)
+
+    async def clear(self, user_id: int) -> None:
+        await self.load(user_id, {}, self._versions.get(user_id, 0) + 1, dirty=True)
+
+    async def pop_dirty(self, count: int) -> list[int]:
+        return [self._dirty.pop() for _ in range(min(count, len(self._dirty)))]
+
+    async def mark_dirty(self, user_ids: list[int]) -> None:
+        self._dirty.update(user_ids)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisCartStore:
+    """One hash per cart (`cart:<user id>`) plus a set of dirty user ids."""
+
+    DIRTY_KEY = "carts:dirty"
+    # product ids start at 1, so field "0" can hold the cart's version; it also
+    # marks a cart that exists but is empty
+    VERSION_FIELD = "0"
+
+    def __init__(self, url: str):
+        self.redis = redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"cart:{user_id}"
+
+    def _parse(self, fields: dict[str, str]) -> dict[int, int] | None:
+        if not fields:
+            return None
+        return {
+            int(product_id): int(quantity)
+            for product_id, quantity in fields.items()
+            if product_id != self.VERSION_FIELD
+        }
+
+    def _snapshot(self, fields: dict[str, str]) -> tuple[dict[int, int], int] | None:
+        if not fields:
+            return None
+        return self._parse(fields), int(fields.get(self.VERSION_FIELD, 0))
+
+    async def get(self, user_id: int) -> dict[int, int] | None:
+        return self._parse(await self.redis.hgetall(self.key(user_id)))
+
+    async def get_many(
+        self, user_ids: list[int]
+    ) -> list[tuple[dict[int, int], int] | None]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.hgetall(self.key(user_id))
+            return [self._snapshot(fields) for fields in await pipe.execute()]
+
+    async def load(
+        self, user_id: int, cart: dict[int, int], version: int, dirty: bool = False
+    ):
+        key = self.key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={self.VERSION_FIELD: version, **cart})
+            pipe.expire(key, CART_TTL_SECONDS)
+            if dirty:
+                pipe.sadd(self.DIRTY_KEY, user_id)
+            await pipe.execute()
+
+    async def increment(self, user_id: int, product_id: int, quantity: int) -> int:
+        key = self.key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hincrby(key, product_id, quantity)
+            pipe.hincrby(key, self.VERSION_FIELD, 1)
+            pipe.expire(key, CART_TTL_SECONDS)
+            pipe.sadd(self.DIRTY_KEY, user_id)
+            new_quantity, _, _, _ = await pipe.execute()
+        return new_quantity
+
+    async def set_quantity(self, user_id: int, product_id: int, quantity: int) -> None:
+        key = self.key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if quantity > 0:
+                pipe.hset(key, product_id, quantity)
+            else:
+                pipe.hdel(key, product_id)
+            pipe.hincrby(key, self.VERSION_FIELD, 1)
+            pipe.expire(key, CART_TTL_SECONDS)
+            pipe.sadd(self.DIRTY_KEY, user_id)
+            await pipe.execute()
+
+    async def clear(self, user_id: int) -> None:
+        key = self.key(user_id)
+
+        async def replace(pipe) -> None:
+            # WATCHed, so a change between the read and the write retries it
+            version = int(await pipe.hget(key, self.VERSION_FIELD) or 0)
+            pipe.multi()
+            pipe.delete(key)
+            pipe.hset(key, self.VERSION_FIELD, version + 1)
+            pipe.expire(key, CART_TTL_SECONDS)
+            pipe.sadd(self.DIRTY_KEY, user_id)
+
+        await self.redis.transaction(replace, key)
+
+    async def pop_dirty(self, count: int) -> list[int]:
+        return [
+            int(user_id) for user_id in await self.redis.spop(self.DIRTY_KEY, count)
+        ]
+
+    async def mark_dirty(self, user_ids: list[int]) -> None:
+        if user_ids:
+            await self.redis.sadd(self.DIRTY_KEY, *user_ids)
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+def create_cart_store():
+    if CART_STORE == "redis":
+        return RedisCartStore(REDIS_URL or "redis://localhost:6379/0")
+    return MemoryCartStore()
+
+
+cart_store = create_cart_store()
+
+
+# Claims the flush of each cart whose snapshot is newer than the persisted one
+# and returns those user ids. Another worker flushing the same cart waits for
+# the row lock, then skips it unless its snapshot is newer still.
+ADVANCE_CART_VERSIONS = text(
+    """
+    INSERT INTO carts (user_id, version, updated_at)
+    SELECT flushed.user_id, flushed.version, timezone('utc', now())
+    FROM unnest(
+        CAST(:user_ids AS integer[]), CAST(:versions AS bigint[])
+    ) AS flushed(user_id, version)
+    JOIN users ON users.id = flushed.user_id
+    ON CONFLICT (user_id) DO UPDATE
+    SET version = excluded.version, updated_at = excluded.updated_at
+    WHERE excluded.version > carts.version
+    RETURNING user_id
+    """
+)
+
+
+# only for carts claimed above; the join drops products deleted since they
+# were added
+UPSERT_CART_ITEMS = text(
+    """
+    INSERT INTO cart_items (user_id, product_id, quantity, updated_at)
+    SELECT items.user_id, items.product_id, items.quantity, timezone('utc', now())
+    FROM unnest(
+        CAST(:user_ids AS integer[]),
+        CAST(:product_ids AS integer[]),
+        CAST(:quantities AS integer[])
+    ) AS items(user_id, product_id, quantity)
+    JOIN products ON products.id = items.product_id
+    ON CONFLICT (user_id, product_id) DO UPDATE
+    SET quantity = excluded.quantity, updated_at = excluded.updated_at
+    """
+)
+
+
+DELETE_REMOVED_CART_ITEMS = text(
+    """
+    DELETE FROM cart_items
+    WHERE user_id = ANY(CAST(:flushed_user_ids AS integer[]))
+    AND NOT EXISTS (
+        SELECT 1
+        FROM unnest(
+            CAST(:user_ids AS integer[]), CAST(:product_ids AS integer[])
+        ) AS kept(user_id, product_id)
+        WHERE kept.user_id = cart_items.user_id
+        AND kept.product_id = cart_items.product_id
+    )
+    """
+)
+
+
+class CartPersister:
+    """Writes dirty carts behind to Postgres in batches."""
+
+    def __init__(self, store, session_factory=async_session):
+        self.store = store
+        self.session_factory = session_factory
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # don't lose what changed since the last flush
+        while await self.flush_batch() >= CART_FLUSH_BATCH_SIZE:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                flushed = await self.flush_batch()
+            except Exception:
+                logger.exception("Cart write-behind failed")
+                flushed = 0
+            if flushed < CART_FLUSH_BATCH_SIZE:
+                await asyncio.sleep(CART_FLUSH_INTERVAL)
+
+    async def flush_batch(self) -> int:
+        """Persist up to CART_FLUSH_BATCH_SIZE dirty carts and return how many."""
+        user_ids = await self.store.pop_dirty(CART_FLUSH_BATCH_SIZE)
+        if not user_ids:
+            return 0
+        snapshots = await self.store.get_many(user_ids)
+        # a cart that expired from the store keeps its last persisted copy
+        loaded = {
+            user_id: snapshot
+            for user_id, snapshot in zip(user_ids, snapshots)
+            if snapshot is not None
+        }
+        try:
+            async with self.session_factory() as db:
+                claimed = await db.scalars(
+                    ADVANCE_CART_VERSIONS,
+                    {
+                        "user_ids": list(loaded),
+                        "versions": [version for _, version in loaded.values()],
+                    },
+                )
+                flushed_user_ids = claimed.all()
+                rows = [
+                    (user_id, product_id, quantity)
+                    for user_id in flushed_user_ids
+                    for product_id, quantity in loaded[user_id][0].items()
+                ]
+                user_column, product_column, quantity_column = (
+                    [list(column) for column in zip(*rows)] if rows else ([], [], [])
+                )
+                await db.execute(
+                    DELETE_REMOVED_CART_ITEMS,
+                    {
+                        "flushed_user_ids": flushed_user_ids,
+                        "user_ids": user_column,
+                        "product_ids": product_column,
+                    },
+                )
+                await db.execute(
+                    UPSERT_CART_ITEMS,
+                    {
+                        "user_ids": user_column,
+                        "product_ids": product_column,
+                        "quantities": quantity_column,
+                    },
+                )
+                await db.commit()
+        except Exception:
+            await self.store.mark_dirty(user_ids)
+            raise
+        return len(user_ids)
+
+
+cart_persister = CartPersister(cart_store)
+
+
+class ProductPrice(NamedTuple):
+    name: str
+    price: float
+    discount_price: float | None
+
+    @property
+    def unit_price(self) -> float:
+        return self.price if self.discount_price is None else self.discount_price
+
+
+price_cache = TTLCache(maxsize=10000, ttl=PRICE_CACHE_TTL_SECONDS)
+
+
+async def get_product_prices(db: AsyncSession, product_ids) -> dict[int, ProductPrice]:
+    """Prices from the in-process cache; the misses are fetched in one query."""
+    prices, missing = {}, []
+    for product_id in product_ids:
+        price = price_cache.get(product_id)
+        if price is None:
+            missing.append(product_id)
+        else:
+            prices[product_id] = price
+    if missing:
+        query = await db.execute(
+            select(
+                models.DBProduct.id,
+                models.DBProduct.name,
+                models.DBProduct.price,
+                models.DBProduct.discount_price,
+            ).filter(models.DBProduct.id.in_(missing))
+        )
+        for product_id, name, price, discount_price in query.all():
+            prices[product_id] = ProductPrice(name, price, discount_price)
+            price_cache.set(product_id, prices[product_id])
+    return prices
+
+
+async def load_cart(db: AsyncSession, user_id: int) -> dict[int, int]:
+    cart = await cart_store.get(user_id)
+    if cart is None:
+        query = await db.execute(
+            select(models.DBCartItem.product_id, models.DBCartItem.quantity).filter(
+                models.DBCartItem.user_id == user_id
+            )
+        )
+        cart = dict(query.all())
+        # later changes must be newer than the persisted copy to be flushed
+        version = await db.scalar(
+            select(models.DBCart.version).filter(models.DBCart.user_id == user_id)
+        )
+        await cart_store.load(user_id, cart, version or 0)
+    return cart
+
+
+async def get_cart(db: AsyncSession, user_id: int) -> dict:
+    cart = await load_cart(db, user_id)
+    prices = await get_product_prices(db, cart)
+    items, total, item_count = [], 0.0, 0
+    for product_id, quantity in cart.items():
+        price = prices.get(product_id)
+        if price is None:  # the product was deleted
+            continue
+        line_total = price.unit_price * quantity
+        items.append(
+            {
+                "product_id": product_id,
+                "name": price.name,
+                "quantity": quantity,
+                "unit_price": price.unit_price,
+                "line_total": line_total,
+            }
+        )
+        total += line_total
+        item_count += quantity
+    return {"items": items, "item_count": item_count, "total": round(total, 2)}
+
+
+async def _check_product(db: AsyncSession, product_id: int) -> None:
+    if product_id not in await get_product_prices(db, [product_id]):
+        raise HTTPException(status_code=404, detail="Product not found")
+
+
+async def add_to_cart(
+    db: AsyncSession, user_id: int, product_id: int, quantity: int = 1
+) -> dict:
+    if quantity <= 0:
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
+    await _check_product(db, product_id)
+    cart = await load_cart(db, user_id)
+    if product_id not in cart and len(cart) >= CART_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail="Cart is full")
+    new_quantity = await cart_store.increment(user_id, product_id, quantity)
+    if new_quantity > CART_MAX_QUANTITY:
+        await cart_store.set_quantity(user_id, product_id, CART_MAX_QUANTITY)
+    return await get_cart(db, user_id)
+
+
+async def update_cart_item(
+    db: AsyncSession, user_id: int, product_id: int, quantity: int
+) -> dict:
+    """Set the quantity of a cart line; 0 removes it."""
+    if quantity < 0 or quantity > CART_MAX_QUANTITY:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Quantity must be between 0 and {CART_MAX_QUANTITY}",
+        )
+    cart = await load_cart(db, user_id)
+    if quantity > 0:
+        await _check_product(db, product_id)
+        if product_id not in cart and len(cart) >= CART_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail="Cart is full")
+    await cart_store.set_quantity(user_id, product_id, quantity)
+    return await get_cart(db, user_id)
+
+
+async def clear_cart(db: AsyncSession, user_id: int) -> dict:
+    await cart_store.clear(user_id)
+    return await get_cart(db, user_id)
@@ -0,0 +1,30 @@
+from typing import Iterable, Sequence
+
+from sqlalchemy import Row
+
+
+class DTO:
+    """Plain result object for column-limited queries, far cheaper than an ORM instance.
+
+    Subclasses list every column they can carry in __slots__; a query only
+    fills the ones it selected, and reading any other raises AttributeError.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row: Row, fields: Sequence[str] | None = None):
+        """Instance from the row's columns, or only its leading `fields`."""
+        instance = cls.__new__(cls)
+        for name, value in zip(fields or row._fields, row):
+            setattr(instance, name, value)
+        return instance
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Row]) -> list:
+        return [cls.from_row(row) for row in rows]
+
+
+def project(model, columns: Sequence[str]) -> list:
+    """Column attributes of `model` for a select()."""
+    return [getattr(model, column) for column in columns]
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+import aiosmtplib
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import models
+from database.engine import async_session
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAIL_USERNAME = os.getenv("MAIL_USERNAME")
+MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
+MAIL_FROM = os.getenv("MAIL_FROM")
+MAIL_PORT = int(os.getenv("MAIL_PORT", "587"))
+MAIL_SERVER = os.getenv("MAIL_SERVER") or "smtp.gmail.com"
+MAIL_STARTTLS = os.getenv("MAIL_STARTTLS", "true").lower() == "true"
+MAIL_USE_CREDENTIALS = os.getenv("MAIL_USE_CREDENTIALS", "true").lower() == "true"
+MAIL_VALIDATE_CERTS = os.getenv("MAIL_VALIDATE_CERTS", "true").lower() == "true"
+
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "5"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_DELAY = float(os.getenv("EMAIL_RETRY_BASE_DELAY", "30"))
+
+
+async def enqueue_email(
+    db: AsyncSession, recipient: str, subject: str, body: str, subtype: str = "plain"
+) -> models.DBEmailOutbox:
+    """Add a message to the outbox; it is only sent once the caller's transaction commits."""
+    message = models.DBEmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        subtype=subtype,
+    )
+    db.add(message)
+    return message
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=EMAIL_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+
+class EmailDispatcher:
+    """Drains the outbox in batches over a single, reused SMTP connection."""
+
+    def __init__(self, session_factory=async_session):
+        self.session_factory = session_factory
+        self._smtp: aiosmtplib.SMTP | None = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._disconnect()
+
+    def notify(self) -> None:
+        """Wake the dispatcher instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                sent = await self.dispatch_batch()
+            except Exception:
+                logger.exception("Email outbox dispatch failed")
+                sent = 0
+            if sent >= EMAIL_BATCH_SIZE:
+                continue  # more may be waiting
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=EMAIL_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch_batch(self) -> int:
+        """Send one batch of due messages and return how many were picked up."""
+        async with self.session_factory() as db:
+            query = await db.execute(
+                select(models.DBEmailOutbox)
+                .filter(
+                    models.DBEmailOutbox.status == models.EmailStatus.pending,
+                    models.DBEmailOutbox.next_attempt_at <= datetime.utcnow(),
+                )
+                .order_by(models.DBEmailOutbox.next_attempt_at)
+                .limit(EMAIL_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            messages = query.scalars().all()
+            for message in messages:
+                try:
+                    await self._send(message)
+                except Exception as exc:
+                    # anything escaping here would roll back the messages
+                    # already sent, and they would be sent again next time
+                    if isinstance(exc, (aiosmtplib.SMTPException, OSError)):
+                        await self._disconnect()
+                    else:
+                        logger.exception("Could not send email %s", message.id)
+                    message.attempts += 1
+                    message.last_error = str(exc)[:500]
+                    if message.attempts >= EMAIL_MAX_ATTEMPTS:
+                        message.status = models.EmailStatus.failed
+                    else:
+                        message.next_attempt_at = datetime.utcnow() + retry_delay(
+                            message.attempts
+                        )
+                else:
+                    message.status = models.EmailStatus.sent
+                    message.sent_at = datetime.utcnow()
+            await db.commit()
+            return len(messages)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+        smtp = aiosmtplib.SMTP(
+            hostname=MAIL_SERVER,
+            port=MAIL_PORT,
+            start_tls=MAIL_STARTTLS,
+            validate_certs=MAIL_VALIDATE_CERTS,
+        )
+        await smtp.connect()
+        if MAIL_USE_CREDENTIALS:
+            await smtp.login(MAIL_USERNAME, MAIL_PASSWORD)
+        self._smtp = smtp
+        return smtp
+
+    async def _disconnect(self) -> None:
+        if self._smtp is not None:
+            try:
+                await self._smtp.quit()
+            except (aiosmtplib.SMTPException, OSError):
+                self._smtp.close()
+            self._smtp = None
+
+    async def _send(self, message: models.DBEmailOutbox) -> None:
+        email = EmailMessage()
+        email["From"] = MAIL_FROM
+        email["To"] = message.recipient
+        email["Subject"] = message.subject
+        email.set_content(message.body, subtype=message.subtype)
+        smtp = await self._connect()
+        try:
+            await smtp.send_message(email)
+        except aiosmtplib.SMTPServerDisconnected:
+            # the pooled connection went idle and was dropped by the server
+            await self._disconnect()
+            smtp = await self._connect()
+            await smtp.send_message(email)
+
+
+email_dispatcher = EmailDispatcher()
@@ -0,0 +1,140 @@
+"""Streaming catalog export as NDJSON or CSV.
+
+Rows come from a server-side cursor `EXPORT_BATCH_SIZE` at a time and are
+encoded and sent batch by batch, so memory stays flat however large the
+catalog is. The columns match services/import_service, so an export can be
+imported again as is: every product has a sku, the key the import upserts on
+(migration 5b1e7c0d9a42).
+"""
+
+import csv
+import io
+import json
+import os
+from typing import AsyncIterator
+
+from dotenv import load_dotenv
+from sqlalchemy import Select, func, select
+
+from database import models
+from database.engine import open_read_session
+from services.product_service import apply_product_filters
+
+load_dotenv()
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_COLUMNS = (
+    "id",
+    "sku",
+    "name",
+    "description",
+    "price",
+    "discount_price",
+    "stock",
+    "created_at",
+    "category",
+    "category_description",
+    "images",
+)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def build_export_query(
+    category_id: int | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    in_stock: bool | None = None,
+) -> Select:
+    """Flat product rows; images are aggregated per product so no row is repeated."""
+    images = (
+        select(func.array_agg(models.DBProductImage.link))
+        .where(models.DBProductImage.product_id == models.DBProduct.id)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            models.DBProduct.id,
+            models.DBProduct.sku,
+            models.DBProduct.name,
+            models.DBProduct.description,
+            models.DBProduct.price,
+            models.DBProduct.discount_price,
+            models.DBProduct.stock,
+            models.DBProduct.created_at,
+            models.DBProductCategory.name.label("category"),
+            models.DBProductCategory.description.label("category_description"),
+            images.label("images"),
+        )
+        .join(
+            models.DBProductCategory,
+            models.DBProductCategory.id == models.DBProduct.category_id,
+        )
+        .order_by(models.DBProduct.id)
+    )
+    return apply_product_filters(
+        query,
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+    )
+
+
+def encode_ndjson(rows) -> bytes:
+    lines = []
+    for row in rows:
+        record = row._asdict()
+        record["created_at"] = record["created_at"].isoformat()
+        record["images"] = record["images"] or []
+        lines.append(json.dumps(record, separators=(",", ":")))
+    lines.append("")
+    return "\n".join(lines).encode()
+
+
+def encode_csv(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(
+            (
+                row.id,
+                row.sku,
+                row.name,
+                row.description,
+                row.price,
+                row.discount_price,
+                row.stock,
+                row.created_at.isoformat(),
+                row.category,
+                row.category_description,
+                "|".join(row.images or ()),
+            )
+        )
+    return buffer.getvalue().encode()
+
+
+async def stream_products_export(
+    export_format: str, query: Select, batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """Encode the export batch by batch.
+
+    The session is opened here rather than taken from a dependency, because
+    dependency sessions are closed before a streaming response starts.
+    """
+    if export_format == "csv":
+        # the header goes out before the first query round-trip
+        yield encode_csv((), header=True)
+    async with await open_read_session() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            if export_format == "csv":
+                yield encode_csv(rows)
+            else:
+                yield encode_ndjson(rows)
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+
+load_dotenv()
+
+DOMAIN = os.getenv("DOMAIN")
+IMAGE_ROOT = "uploads/images"
+IMAGE_INCOMING_DIRECTORY = f"{IMAGE_ROOT}/incoming"
+IMAGE_PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", "2"))
+
+# variant name -> longest edge in pixels
+IMAGE_VARIANTS = {"thumb": 160, "card": 480, "full": 1600}
+# extension -> Pillow format and encoder options
+IMAGE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def image_directory(content_hash: str) -> str:
+    return f"{IMAGE_ROOT}/{content_hash[:2]}/{content_hash}"
+
+
+def variant_path(content_hash: str, variant: str, extension: str) -> str:
+    return f"{image_directory(content_hash)}/{variant}.{extension}"
+
+
+def variant_urls(content_hash: str | None) -> list[dict]:
+    if not content_hash:
+        return []
+    return [
+        {
+            "name": variant,
+            "format": extension,
+            "width": width,
+            "url": f"{DOMAIN}/{variant_path(content_hash, variant, extension)}",
+        }
+        for variant, width in IMAGE_VARIANTS.items()
+        for extension in IMAGE_FORMATS
+    ]
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _render_variants(source_path: str, directory: str) -> None:
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original).convert("RGB")
+    for variant, width in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((width, width), Image.Resampling.LANCZOS)
+        for extension, (image_format, options) in IMAGE_FORMATS.items():
+            final_path = f"{directory}/{variant}.{extension}"
+            temp_path = f"{final_path}.{os.getpid()}.part"
+            resized.save(temp_path, format=image_format, **options)
+            os.replace(temp_path, final_path)
+
+
+def _store_image(source_path: str) -> str:
+    """Move an upload under its content hash and render the variants (worker process)."""
+    content_hash = _file_sha256(source_path)
+    directory = image_directory(content_hash)
+    if os.path.exists(variant_path(content_hash, "full", "jpg")):
+        os.unlink(source_path)  # identical bytes were stored before
+        return content_hash
+    os.makedirs(directory, exist_ok=True)
+    try:
+        _render_variants(source_path, directory)
+    except Exception:
+        os.unlink(source_path)
+        raise
+    extension = os.path.splitext(source_path)[1]
+    os.replace(source_path, f"{directory}/original{extension}")
+    return content_hash
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def store_image(source_path: str) -> str:
+    """Content-address an uploaded image, render its variants and return the hash."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_executor(), _store_image, source_path)
+    except (OSError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="Invalid image")
@@ -0,0 +1,323 @@
+"""Bulk product import from CSV or JSONL.
+
+    python -m services.import_service products.csv [--format csv|jsonl]
+
+Rows are parsed in batches on a worker thread, COPYed into a temp staging
+table and upserted from there, so memory stays bounded by the batch size.
+Columns: sku, name, description, price, discount_price, stock, category,
+category_description, images (a list in JSONL, `|` separated in CSV).
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import math
+import os
+import sys
+from typing import Callable, Iterator, TextIO
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.result_cache import mark_changed, result_store
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+
+STAGING_COLUMNS = (
+    "line",
+    "sku",
+    "name",
+    "description",
+    "price",
+    "discount_price",
+    "stock",
+    "category",
+    "category_description",
+    "images",
+)
+
+CREATE_STAGING_TABLE = text(
+    """
+    CREATE TEMP TABLE product_import_staging (
+        line integer NOT NULL,
+        sku text NOT NULL,
+        name text NOT NULL,
+        description text,
+        price double precision NOT NULL,
+        discount_price double precision,
+        stock integer NOT NULL,
+        category text NOT NULL,
+        category_description text,
+        images text[] NOT NULL
+    ) ON COMMIT DROP
+    """
+)
+
+# DISTINCT ON keeps the last row per key, since ON CONFLICT cannot touch a row twice
+UPSERT_CATEGORIES = text(
+    """
+    INSERT INTO product_categories (name, description)
+    SELECT DISTINCT ON (category) category, category_description
+    FROM product_import_staging
+    ORDER BY category, line DESC
+    ON CONFLICT (name) DO UPDATE
+    SET description = COALESCE(excluded.description, product_categories.description)
+    """
+)
+
+UPSERT_PRODUCTS = text(
+    """
+    INSERT INTO products (
+        sku, name, description, price, discount_price, stock, created_at, category_id
+    )
+    SELECT DISTINCT ON (staging.sku)
+        staging.sku, staging.name, staging.description, staging.price,
+        staging.discount_price, staging.stock, timezone('utc', now()), categories.id
+    FROM product_import_staging AS staging
+    JOIN product_categories AS categories ON categories.name = staging.category
+    ORDER BY staging.sku, staging.line DESC
+    ON CONFLICT (sku) DO UPDATE
+    SET name = excluded.name,
+        description = excluded.description,
+        price = excluded.price,
+        discount_price = excluded.discount_price,
+        stock = excluded.stock,
+        category_id = excluded.category_id
+    """
+)
+
+UPSERT_IMAGES = text(
+    """
+    INSERT INTO product_images (product_id, link)
+    SELECT DISTINCT products.id, image.link
+    FROM product_import_staging AS staging
+    JOIN products ON products.sku = staging.sku
+    CROSS JOIN LATERAL unnest(staging.images) AS image(link)
+    ON CONFLICT (product_id, link) DO NOTHING
+    """
+)
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_imported = 0
+        self.error_count = 0
+        self.errors: list[dict] = []
+
+    def add_error(self, line: int, error: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows_read": self.rows_read,
+            "rows_imported": self.rows_imported,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def _text(record: dict, field: str, max_length: int, required: bool = False):
+    value = record.get(field)
+    value = str(value).strip() if value is not None else ""
+    if not value:
+        if required:
+            raise ValueError(f"`{field}` is required")
+        return None
+    if len(value) > max_length:
+        raise ValueError(f"`{field}` is longer than {max_length} characters")
+    return value
+
+
+def _number(record: dict, field: str, integral: bool = False, required: bool = False):
+    value = record.get(field)
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"`{field}` is required")
+        return None
+    # JSON true would otherwise pass as 1
+    if isinstance(value, bool):
+        raise ValueError(f"`{field}` is not a valid number")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"`{field}` is not a valid number")
+    # Postgres stores NaN and infinity, but GraphQL can't serialize them
+    if not math.isfinite(number):
+        raise ValueError(f"`{field}` must be a finite number")
+    if number < 0:
+        raise ValueError(f"`{field}` must not be negative")
+    if integral:
+        if not number.is_integer():
+            raise ValueError(f"`{field}` must be a whole number")
+        return int(number)
+    return number
+
+
+def parse_record(line: int, record: dict) -> tuple:
+    """Validate one input record and return it as a staging row."""
+    images = record.get("images") or []
+    if isinstance(images, str):
+        images = images.split("|")
+    images = [str(link).strip() for link in images if str(link).strip()]
+    return (
+        line,
+        _text(record, "sku", 64, required=True),
+        _text(record, "name", 255, required=True),
+        _text(record, "description", 255),
+        _number(record, "price", required=True),
+        _number(record, "discount_price"),
+        _number(record, "stock", integral=True) or 0,
+        _text(record, "category", 255, required=True),
+        _text(record, "category_description", 500),
+        images,
+    )
+
+
+def iter_records(file: TextIO, file_format: str) -> Iterator[tuple[int, dict | str]]:
+    """Yield (line number, record) pairs; unparsable JSONL lines come back as str."""
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+    elif file_format == "jsonl":
+        for line, raw in enumerate(file, start=1):
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except json.JSONDecodeError as exc:
+                yield line, f"invalid JSON: {exc.msg}"
+                continue
+            yield line, record if isinstance(record, dict) else "expected an object"
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+def read_batch(
+    records: Iterator[tuple[int, dict | str]], report: ImportReport
+) -> tuple[list[tuple], bool]:
+    """Parse up to IMPORT_BATCH_SIZE records; returns the valid rows and whether input is left."""
+    rows = []
+    for line, record in records:
+        report.rows_read += 1
+        try:
+            if isinstance(record, str):
+                raise ValueError(record)
+            rows.append(parse_record(line, record))
+        except ValueError as exc:
+            report.add_error(line, str(exc))
+        if report.rows_read % IMPORT_BATCH_SIZE == 0:
+            return rows, True
+    return rows, False
+
+
+async def load_batch(db: AsyncSession, rows: list[tuple]) -> None:
+    """COPY a batch into the staging table and upsert it, in one transaction."""
+    connection = await db.connection()
+    await connection.execute(CREATE_STAGING_TABLE)
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        "product_import_staging", records=rows, columns=STAGING_COLUMNS
+    )
+    await connection.execute(UPSERT_CATEGORIES)
+    await connection.execute(UPSERT_PRODUCTS)
+    await connection.execute(UPSERT_IMAGES)
+    mark_changed(db, "products", "categories", "images")
+    await db.commit()
+
+
+async def import_products(
+    db: AsyncSession,
+    file: TextIO,
+    file_format: str,
+    progress: Callable[[ImportReport], None] | None = None,
+) -> ImportReport:
+    if db.bind.dialect.name != "postgresql":
+        raise HTTPException(status_code=400, detail="Bulk import requires PostgreSQL")
+    report = ImportReport()
+    records = iter_records(file, file_format)
+    has_more = True
+    while has_more:
+        try:
+            # csv/json parsing is CPU bound, keep it off the event loop
+            rows, has_more = await asyncio.to_thread(read_batch, records, report)
+        except (csv.Error, UnicodeDecodeError) as exc:
+            report.add_error(report.rows_read + 1, f"unreadable input: {exc}")
+            break
+        if not rows:
+            continue
+        try:
+            await load_batch(db, rows)
+        except Exception as exc:
+            await db.rollback()
+            for row in rows:
+                report.add_error(row[0], f"batch rejected by the database: {exc}")
+        else:
+            report.rows_imported += len(rows)
+        if progress is not None:
+            progress(report)
+    return report
+
+
+def detect_format(filename: str | None) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(extension, "")
+
+
+def log_progress(report: ImportReport) -> None:
+    logger.info(
+        "Imported %s of %s rows (%s errors)",
+        report.rows_imported,
+        report.rows_read,
+        report.error_count,
+    )
+
+
+async def _import_file(path: str, file_format: str) -> ImportReport:
+    from database.engine import async_session
+
+    def print_progress(report: ImportReport) -> None:
+        print(
+            f"\r{report.rows_imported}/{report.rows_read} rows imported, "
+            f"{report.error_count} errors",
+            end="",
+            file=sys.stderr,
+        )
+
+    with open(path, newline="", encoding="utf-8") as file:
+        async with async_session() as db:
+            report = await import_products(db, file, file_format, print_progress)
+    await result_store.close()  # let the invalidations reach Redis
+    print(file=sys.stderr)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import products")
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default=None)
+    args = parser.parse_args()
+    file_format = args.format or detect_format(args.path)
+    if not file_format:
+        parser.error("cannot tell the format from the extension, pass --format")
+    report = asyncio.run(_import_file(args.path, file_format))
+    json.dump(report.as_dict(), sys.stdout, indent=2)
+    print()
+    if report.error_count:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
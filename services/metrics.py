@@ -0,0 +1,109 @@
+"""Prometheus metrics of the app, served at /metrics.
+
+SQL and pool metrics live in database/metrics.py. With several worker
+processes (uvicorn --workers, gunicorn) set PROMETHEUS_MULTIPROC_DIR in the
+server's environment, not in .env, to an empty directory that is wiped
+before the server starts: every worker writes its samples there and
+/metrics on any worker reports all of them, counters and histograms summed.
+A worker drops its live gauges when it shuts down (mark_worker_exited()).
+Under gunicorn, also call mark_process_dead(worker.pid) from a child_exit
+hook, which covers workers that crashed.
+"""
+
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+load_dotenv()
+
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+graphql_operation_duration = Histogram(
+    "graphql_operation_duration_seconds",
+    "GraphQL operation latency by operation name",
+    ["operation", "type"],
+    buckets=LATENCY_BUCKETS,
+)
+event_loop_lag = Gauge(
+    "event_loop_lag_seconds",
+    "How late a timer on the event loop fired, last measurement",
+    multiprocess_mode="livemax",
+)
+single_flight_calls = Counter(
+    "single_flight_calls_total", "Calls to coalesced reads", ["group"]
+)
+single_flight_coalesced = Counter(
+    "single_flight_coalesced_total",
+    "Calls that joined a read already in flight instead of querying",
+    ["group"],
+)
+single_flight_timeouts = Counter(
+    "single_flight_timeouts_total", "Coalesced reads that timed out", ["group"]
+)
+
+
+class EventLoopLagMonitor:
+    """Sleeps `interval` seconds in a loop and records how much longer it took."""
+
+    def __init__(self, interval: float = EVENT_LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            event_loop_lag.set(max(0.0, loop.time() - started - self.interval))
+
+
+event_loop_monitor = EventLoopLagMonitor()
+
+
+def mark_worker_exited() -> None:
+    """Remove this worker's livesum/livemax gauge files, so its last values
+    stop counting towards the totals."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        mark_process_dead(os.getpid())
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """The exposition text and its content type."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
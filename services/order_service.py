@@ -0,0 +1,138 @@
+from collections import Counter
+
+from fastapi import HTTPException
+from sqlalchemy import Row, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from database import models
+from serializers import order_serializer
+
+
+async def reserve_stock(db: AsyncSession, product_id: int, quantity: int) -> Row | None:
+    """Atomically take `quantity` units; None if too few are left or no such product.
+
+    The check and the decrement are one statement, so concurrent checkouts
+    never read a stale stock value and never oversell. The row lock it takes
+    is held only until the surrounding (short) transaction commits.
+    """
+    query = await db.execute(
+        update(models.DBProduct)
+        .where(
+            models.DBProduct.id == product_id,
+            models.DBProduct.stock >= quantity,
+        )
+        .values(stock=models.DBProduct.stock - quantity)
+        .returning(models.DBProduct.price, models.DBProduct.discount_price)
+    )
+    return query.one_or_none()
+
+
+async def release_stock(db: AsyncSession, product_id: int, quantity: int) -> None:
+    await db.execute(
+        update(models.DBProduct)
+        .where(models.DBProduct.id == product_id)
+        .values(stock=models.DBProduct.stock + quantity)
+    )
+
+
+async def place_order(
+    db: AsyncSession, user_id: int, items: list[order_serializer.OrderItemInput]
+) -> models.DBOrder:
+    quantities = Counter()
+    for item in items:
+        quantities[item.product_id] += item.quantity
+
+    order = models.DBOrder(user_id=user_id, total_price=0)
+    unavailable = []
+    # always lock products in id order so two multi-item checkouts cannot deadlock
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        reserved = await reserve_stock(db, product_id, quantity)
+        if reserved is None:
+            unavailable.append(product_id)
+            continue
+        unit_price = (
+            reserved.discount_price
+            if reserved.discount_price is not None
+            else reserved.price
+        )
+        order.items.append(
+            models.DBOrderItem(
+                product_id=product_id, quantity=quantity, unit_price=unit_price
+            )
+        )
+        order.total_price += unit_price * quantity
+
+    if unavailable:
+        # the update matches nothing for a product that doesn't exist either
+        existing = set(
+            await db.scalars(
+                select(models.DBProduct.id).filter(models.DBProduct.id.in_(unavailable))
+            )
+        )
+        await db.rollback()
+        missing = [
+            product_id for product_id in unavailable if product_id not in existing
+        ]
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail={"message": "Product not found", "product_ids": missing},
+            )
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Not enough stock", "product_ids": unavailable},
+        )
+    db.add(order)
+    await db.commit()
+    return order
+
+
+async def get_user_orders(db: AsyncSession, user_id: int) -> list[models.DBOrder]:
+    query = await db.execute(
+        select(models.DBOrder)
+        .options(selectinload(models.DBOrder.items))
+        .filter(models.DBOrder.user_id == user_id)
+        .order_by(models.DBOrder.created_at.desc())
+    )
+    return query.scalars().all()
+
+
+async def cancel_order(db: AsyncSession, user_id: int, order_id: int) -> models.DBOrder:
+    query = await db.execute(
+        select(models.DBOrder)
+        .options(selectinload(models.DBOrder.items))
+        .filter(models.DBOrder.id == order_id, models.DBOrder.user_id == user_id)
+        .with_for_update(of=models.DBOrder)
+    )
+    order = query.scalar_one_or_none()
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if order.status == models.OrderStatus.cancelled:
+        raise HTTPException(status_code=409, detail="Order is already cancelled")
+    for item in sorted(order.items, key=lambda item: item.product_id):
+        await release_stock(db, item.product_id, item.quantity)
+    order.status = models.OrderStatus.cancelled
+    await db.commit()
+    return order
+
+
+async def place_order_view(
+    order_serializer_input: order_serializer.OrderCreate,
+    current_user: models.DBUser,
+    db: AsyncSession,
+):
+    return await place_order(
+        db=db, user_id=current_user.id, items=order_serializer_input.items
+    )
+
+
+async def my_orders_view(current_user: models.DBUser, db: AsyncSession):
+    return await get_user_orders(db=db, user_id=current_user.id)
+
+
+async def cancel_order_view(
+    order_id: int, current_user: models.DBUser, db: AsyncSession
+):
+    return await cancel_order(db=db, user_id=current_user.id, order_id=order_id)
@@ -0,0 +1,239 @@
+"""Cache of GraphQL results, invalidated by tag when catalog rows are written.
+
+Every tag ("products", "categories", "images") has a version number. An
+entry's key includes the versions of its tags at the moment they were read,
+so bumping a version on write orphans all the entries built from the old
+data, including results of queries that were already running; orphans
+simply expire. Versions are bumped after the transaction that changed the
+rows commits, found through SQLAlchemy session events:
+
+- ORM instances of DBProduct, DBProductCategory, DBProductImage being
+  added, changed or deleted (after_flush)
+- update()/delete()/insert() statements against those models (do_orm_execute)
+- raw SQL, which has to call mark_changed(session, *tags) itself
+
+With several workers use the Redis backend, so a write seen by one worker
+invalidates the entries of all of them; the in-process backend only
+invalidates its own worker and relies on the TTLs for the others.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Iterable
+
+from dotenv import load_dotenv
+from redis import asyncio as redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database.models import DBProduct, DBProductCategory, DBProductImage
+from services.cache import TTLCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+# "memory", "redis" or "off"
+GRAPHQL_RESULT_CACHE = os.getenv("GRAPHQL_RESULT_CACHE") or (
+    "redis" if REDIS_URL else "memory"
+)
+GRAPHQL_RESULT_CACHE_SIZE = int(os.getenv("GRAPHQL_RESULT_CACHE_SIZE", "1000"))
+
+MODEL_TAGS = {
+    DBProduct: "products",
+    DBProductCategory: "categories",
+    DBProductImage: "images",
+}
+
+_PENDING_TAGS = "result_cache_tags"
+
+
+class MemoryResultStore:
+    def __init__(self, maxsize: int = GRAPHQL_RESULT_CACHE_SIZE):
+        # the longest TTL is passed on every set()
+        self.entries = TTLCache(maxsize=maxsize, ttl=0)
+        self.versions: dict[str, int] = {}
+
+    async def tag_versions(self, tags: Iterable[str]) -> list[int]:
+        return [self.versions.get(tag, 0) for tag in tags]
+
+    async def get(self, key: str) -> Any:
+        return self.entries.get(key)
+
+    async def set(self, key: str, data: Any, ttl: float) -> None:
+        self.entries.set(key, data, ttl=ttl)
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self.versions[tag] = self.versions.get(tag, 0) + 1
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisResultStore:
+    PREFIX = "gql:"
+
+    def __init__(self, url: str):
+        self.redis = redis.from_url(url, decode_responses=True)
+
+    async def tag_versions(self, tags: Iterable[str]) -> list[int]:
+        keys = [f"{self.PREFIX}tag:{tag}" for tag in tags]
+        if not keys:
+            return []
+        return [int(version or 0) for version in await self.redis.mget(keys)]
+
+    async def get(self, key: str) -> Any:
+        value = await self.redis.get(f"{self.PREFIX}result:{key}")
+        return None if value is None else json.loads(value)
+
+    async def set(self, key: str, data: Any, ttl: float) -> None:
+        await self.redis.set(
+            f"{self.PREFIX}result:{key}",
+            json.dumps(data, separators=(",", ":")),
+            px=int(ttl * 1000),
+        )
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"{self.PREFIX}tag:{tag}")
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+class ResultStore:
+    """Front for the configured backend.
+
+    Backend errors are logged and treated as misses: a cache outage must
+    not fail requests.
+    """
+
+    def __init__(self, backend: MemoryResultStore | RedisResultStore | None):
+        self.backend = backend
+        self._invalidations: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def key(self, operation_key: str, variables: dict | None, tags) -> str | None:
+        """Entry key for an operation, its variables and the current tag versions.
+
+        None when the versions can't be read: the operation then isn't cached.
+        """
+        try:
+            versions = await self.backend.tag_versions(tags)
+        except Exception:
+            logger.warning("Result cache version read failed", exc_info=True)
+            return None
+        payload = json.dumps(
+            [operation_key, variables or {}, versions],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def get(self, key: str) -> Any:
+        try:
+            return await self.backend.get(key)
+        except Exception:
+            logger.warning("Result cache read failed", exc_info=True)
+            return None
+
+    async def set(self, key: str, data: Any, ttl: float) -> None:
+        try:
+            await self.backend.set(key, data, ttl)
+        except Exception:
+            logger.warning("Result cache write failed", exc_info=True)
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        try:
+            await self.backend.invalidate(sorted(tags))
+        except Exception:
+            # the entries still expire with their TTL
+            logger.warning("Result cache invalidation failed", exc_info=True)
+
+    def invalidate_soon(self, tags: Iterable[str]) -> None:
+        """Run invalidate() on the event loop, from sync code such as session events."""
+        if not self.enabled or not tags:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # a sync engine outside the app, nothing to invalidate
+            return
+        task = loop.create_task(self.invalidate(tags))
+        self._invalidations.add(task)
+        task.add_done_callback(self._invalidations.discard)
+
+    async def close(self) -> None:
+        if self._invalidations:
+            await asyncio.gather(*self._invalidations)
+        if self.backend is not None:
+            await self.backend.close()
+
+
+def _create_backend() -> MemoryResultStore | RedisResultStore | None:
+    if GRAPHQL_RESULT_CACHE == "off":
+        return None
+    if GRAPHQL_RESULT_CACHE == "redis":
+        return RedisResultStore(REDIS_URL or "redis://localhost:6379/0")
+    return MemoryResultStore()
+
+
+result_store = ResultStore(_create_backend())
+
+
+def mark_changed(session, *tags: str) -> None:
+    """Invalidate `tags` once `session` commits; for writes made with raw SQL."""
+    session = getattr(session, "sync_session", session)  # accepts an AsyncSession
+    session.info.setdefault(_PENDING_TAGS, set()).update(tags)
+
+
+def _tag_of(entity) -> str | None:
+    for model, tag in MODEL_TAGS.items():
+        if isinstance(entity, model) or entity is model:
+            return tag
+    return None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context) -> None:
+    tags = {
+        tag
+        for instance in (*session.new, *session.dirty, *session.deleted)
+        if (tag := _tag_of(instance)) is not None
+    }
+    if tags:
+        mark_changed(session, *tags)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_writes(orm_execute_state) -> None:
+    if not (
+        orm_execute_state.is_update
+        or orm_execute_state.is_delete
+        or orm_execute_state.is_insert
+    ):
+        return
+    mapper = orm_execute_state.bind_mapper
+    tag = _tag_of(mapper.class_) if mapper is not None else None
+    if tag is not None:
+        mark_changed(orm_execute_state.session, tag)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session) -> None:
+    result_store.invalidate_soon(session.info.pop(_PENDING_TAGS, set()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session) -> None:
+    session.info.pop(_PENDING_TAGS, None)
@@ -0,0 +1,117 @@
+"""Coalesce identical concurrent reads into one database round-trip.
+
+While a call for a key is in flight on this worker, later callers with the
+same key wait for it and get the same result (or exception) instead of
+running the query again. Nothing is kept once the call finishes: this is
+not a cache, it only removes duplicates from bursts such as the misses
+that follow a deploy or a cache invalidation.
+
+The shared call must not use the session of the request that happened to
+start it, since that request may be cancelled or finish first; the loaders
+open their own session. That is one more connection only while the query
+runs: request read sessions (database.engine.ReadSession) hold none between
+statements, so a flight never waits for a connection its own callers keep.
+Results are shared between callers, so they must be treated as read-only.
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from services.metrics import (
+    single_flight_calls,
+    single_flight_coalesced,
+    single_flight_timeouts,
+)
+
+load_dotenv()
+
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "10"))
+
+T = TypeVar("T")
+
+single_flight_groups: list["SingleFlight"] = []
+
+
+class SingleFlight:
+    def __init__(self, name: str, timeout: float = SINGLE_FLIGHT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self._flights: dict[Hashable, asyncio.Task] = {}
+        # counters, read by single_flight_stats()
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+        single_flight_groups.append(self)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(
+        self,
+        key: Hashable,
+        function: Callable[[], Awaitable[T]],
+        timeout: float | None = None,
+    ) -> T:
+        """Result of `function()`, run once for all concurrent callers with `key`.
+
+        `timeout` bounds the shared call, not each caller's wait; when it
+        runs out every waiter gets a 503 and the next call starts afresh.
+        """
+        self.calls += 1
+        single_flight_calls.labels(self.name).inc()
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._run(key, function, self.timeout if timeout is None else timeout)
+            )
+            # retrieve the exception even when every waiter was cancelled
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._flights[key] = task
+        else:
+            self.coalesced += 1
+            single_flight_coalesced.labels(self.name).inc()
+        # a cancelled caller must not cancel the call the others wait for
+        return await asyncio.shield(task)
+
+    async def _run(
+        self, key: Hashable, function: Callable[[], Awaitable[T]], timeout: float
+    ) -> T:
+        try:
+            return await asyncio.wait_for(function(), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            single_flight_timeouts.labels(self.name).inc()
+            raise HTTPException(
+                status_code=503, detail=f"Timed out waiting for {self.name}"
+            )
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._flights.pop(key, None)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+        }
+
+
+def single_flight_stats() -> dict[str, dict[str, int]]:
+    return {group.name: group.stats() for group in single_flight_groups}
+
+
+async def drain_single_flights() -> None:
+    """Wait for the shared calls still running, which may have outlived the
+    requests that started them, so that none holds a connection at shutdown."""
+    tasks = [task for group in single_flight_groups for task in group._flights.values()]
+    await asyncio.gather(*tasks, return_exceptions=True)
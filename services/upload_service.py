@@ -0,0 +1,66 @@
+import os
+import tempfile
+import uuid
+
+import aiofiles
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile
+
+load_dotenv()
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_PROFILE_PICTURE_SIZE = int(
+    os.getenv("MAX_PROFILE_PICTURE_SIZE", str(5 * 1024 * 1024))
+)
+MAX_PRODUCT_IMAGE_SIZE = int(os.getenv("MAX_PRODUCT_IMAGE_SIZE", str(20 * 1024 * 1024)))
+
+# magic bytes of the image types we accept, mapped to the extension we store
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": ("image/jpeg", ".jpg"),
+    b"\x89PNG\r\n\x1a\n": ("image/png", ".png"),
+}
+
+
+def sniff_image_type(head: bytes) -> tuple[str, str] | None:
+    for signature, image_type in IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            return image_type
+    return None
+
+
+async def save_image_upload(upload: UploadFile, directory: str, max_size: int) -> str:
+    """Stream an uploaded image to `directory` and return its path.
+
+    The bytes go to a temp file next to the destination chunk by chunk, so the
+    size limit is enforced without buffering the upload, and the final rename
+    is atomic.
+    """
+    if upload.size is not None and upload.size > max_size:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    os.close(fd)
+    try:
+        image_type = None
+        size = 0
+        async with aiofiles.open(temp_path, "wb") as file:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                if image_type is None:
+                    image_type = sniff_image_type(chunk)
+                    if image_type is None:
+                        raise HTTPException(
+                            status_code=400, detail="Invalid image type"
+                        )
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail="Image is too large")
+                await file.write(chunk)
+        if image_type is None:
+            raise HTTPException(status_code=400, detail="Empty image")
+        _, extension = image_type
+        image_path = os.path.join(directory, f"{uuid.uuid4()}{extension}")
+        os.replace(temp_path, image_path)
+        return image_path
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -1,46 +1,52 @@
 import os
-import uuid
 from datetime import datetime, timezone, timedelta
-from typing import Sequence, Any
-import aiofiles
+from typing import Sequence
 
 from fastapi import HTTPException, Response, Request, UploadFile
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
-from sqlalchemy import select, Row, RowMapping
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import models
+from database.engine import open_read_session
 from serializers.user_serializer import UserCreate, LoginInput
+from services import password_service
+from services.auth_service import invalidate_cached_user
+from services.dto import DTO, project
+from services.email_service import email_dispatcher, enqueue_email
+from services.image_service import (
+    IMAGE_INCOMING_DIRECTORY,
+    store_image,
+    variant_path,
+)
+from services.single_flight import SingleFlight
+from services.upload_service import MAX_PROFILE_PICTURE_SIZE, save_image_upload
 import jwt
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
 REFRESH_TOKEN_EXPIRE_MINUTES = os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES")
-MAIL_USERNAME = os.getenv("MAIL_USERNAME")
-MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
-MAIL_FROM = os.getenv("MAIL_FROM")
-MAIL_PORT = os.getenv("MAIL_PORT")
-MAIL_SERVER = os.getenv("MAIL_SERVER")
 DOMAIN = os.getenv("DOMAIN")
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=MAIL_USERNAME,
-    MAIL_PASSWORD=MAIL_PASSWORD,
-    MAIL_FROM=MAIL_FROM,
-    MAIL_PORT=MAIL_PORT,
-    MAIL_SERVER="smtp.gmail.com",
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-)
+
+class UserRow(DTO):
+    # deliberately no password or its hash
+    __slots__ = (
+        "id",
+        "username",
+        "email",
+        "bio",
+        "profile_picture",
+        "role",
+        "phone_number",
+        "is_verified",
+        "created_at",
+    )
+
+
+USER_COLUMNS = UserRow.__slots__
 
 
 async def create_access_token(data: dict, expires_delta: timedelta) -> str:
@@ -61,17 +67,15 @@ async def create_verification_token(email: str) -> str:
     return jwt.encode(payload=payload, key=SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def send_verification_email(email: str) -> None:
+async def send_verification_email(email: str, db: AsyncSession) -> None:
     token = await create_verification_token(email=email)
     verification_link = f"http://localhost:8000/api/v1/users/verify?token={token}"
-    message = MessageSchema(
+    await enqueue_email(
+        db=db,
+        recipient=email,
         subject="Verification email",
-        recipients=[email],
         body=f"Verification link: {verification_link}",
-        subtype="plain",
     )
-    fm = FastMail(conf)
-    await fm.send_message(message)
 
 
 async def verify_email_view(token: str, db: AsyncSession) -> dict:
@@ -84,6 +88,7 @@ async def verify_email_view(token: str, db: AsyncSession) -> dict:
         user.is_verified = True
         await db.commit()
         await db.refresh(user)
+        invalidate_cached_user(email)
         return {"message": "Email verified successfully"}
     except jwt.exceptions.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="An error has been occurred.")
@@ -106,10 +111,15 @@ async def login_view(
 ) -> dict:
     user = await get_user_by_email(db, login_serializer.email)
     if user:
-        does_password_match = await verify_password(
-            login_serializer.password, user.password
+        does_password_match, new_hash = (
+            await password_service.verify_and_update_password(
+                login_serializer.password, user.password
+            )
         )
         if does_password_match:
+            if new_hash:  # stored hash predates the configured bcrypt cost
+                user.password = new_hash
+                await db.commit()
             access_token = await create_access_token(
                 data={"sub": user.email},
                 expires_delta=timedelta(minutes=float(ACCESS_TOKEN_EXPIRE_MINUTES)),
@@ -180,10 +190,12 @@ async def refresh_view(request: Request, response: Response) -> dict:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
 
-async def get_all_users(db: AsyncSession) -> Sequence[models.DBUser]:
+async def get_all_users(
+    db: AsyncSession, columns: Sequence[str] = USER_COLUMNS
+) -> list[UserRow]:
     try:
-        query = await db.execute(select(models.DBUser))
-        all_users = query.scalars().all()
+        query = await db.execute(select(*project(models.DBUser, columns)))
+        all_users = UserRow.from_rows(query)
         if all_users:
             return all_users
         raise HTTPException(status_code=404, detail="No users found")
@@ -194,14 +206,16 @@ async def get_all_users(db: AsyncSession) -> Sequence[models.DBUser]:
         )
 
 
-async def get_user_by_id(db: AsyncSession, user_id: int) -> Row[Any] | RowMapping:
+async def get_user_by_id(
+    db: AsyncSession, user_id: int, columns: Sequence[str] = USER_COLUMNS
+) -> UserRow:
     try:
         query = await db.execute(
-            select(models.DBUser).filter(models.DBUser.id == user_id)
+            select(*project(models.DBUser, columns)).filter(models.DBUser.id == user_id)
         )
-        found_user = query.scalars().first()
+        found_user = query.first()
         if found_user:
-            return found_user
+            return UserRow.from_row(found_user)
         raise HTTPException(status_code=404, detail="User not found")
     except Exception as exc:
         raise HTTPException(
@@ -210,12 +224,30 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> Row[Any] | RowMappin
         )
 
 
+user_by_id_flight = SingleFlight("get_user_by_id")
+
+
+async def get_user_by_id_shared(
+    user_id: int, columns: Sequence[str] = USER_COLUMNS
+) -> UserRow:
+    """get_user_by_id on its own read session, shared by identical concurrent calls."""
+
+    async def load() -> UserRow:
+        async with await open_read_session() as db:
+            return await get_user_by_id(db, user_id=user_id, columns=columns)
+
+    return await user_by_id_flight.do((user_id, tuple(columns)), load)
+
+
 async def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return await password_service.hash_password(password)
 
 
 async def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    does_password_match, _ = await password_service.verify_and_update_password(
+        plain_password, hashed_password
+    )
+    return does_password_match
 
 
 async def register_view(
@@ -245,9 +277,10 @@ async def register_view(
             password=await hash_password(register_serializer.password),
         )
         db.add(new_user)
+        await send_verification_email(email=new_user.email, db=db)
         await db.commit()
         await db.refresh(new_user)
-        await send_verification_email(email=new_user.email)
+        email_dispatcher.notify()
         return new_user
 
     except HTTPException as http_exc:
@@ -260,51 +293,43 @@ async def register_view(
         )
 
 
-async def get_current_user(request: Request, db: AsyncSession) -> models.DBUser:
-    access_token = request.headers.get("Authorization")[len("Bearer "):]
-    payload = jwt.decode(jwt=access_token, key=SECRET_KEY, algorithms=ALGORITHM)
-    user_email = payload.get("sub")
-    return await get_user_by_email(email=user_email, db=db)
-
-
-async def my_profile_view(request: Request, db: AsyncSession) -> models.DBUser:
-    try:
-        access_token = request.headers.get("Authorization")[len("Bearer "):]
-        payload = jwt.decode(jwt=access_token, key=SECRET_KEY, algorithms=ALGORITHM)
-        user_email = payload.get("sub")
-        return await get_user_by_email(email=user_email, db=db)
-    except TypeError as exc:
-        raise HTTPException(status_code=404, detail="Header is missing")
-    except jwt.exceptions.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Access token has expired")
+async def my_profile_view(current_user: models.DBUser) -> models.DBUser:
+    return current_user
 
 
 async def edit_my_profile_view(
-        request: Request,
+        claims: dict,
         db: AsyncSession,
         username: str = None,
         bio: str = None,
         profile_picture: UploadFile | str = None,
 ):
-    current_user = await get_current_user(request=request, db=db)
+    # the cached user is a read-only snapshot, so load the row being changed
+    current_user = await get_user_by_email(email=claims.get("sub"), db=db)
+    if current_user is None:
+        raise HTTPException(status_code=401, detail="User not found")
     if username:
         current_user.username = username
     if bio:
         current_user.bio = bio
     if profile_picture:
-        if profile_picture.content_type not in ["image/jpeg", "image/png"]:
-            raise HTTPException(status_code=400, detail="Invalid image type")
-        os.makedirs("uploads/user_profile_pictures", exist_ok=True)
-        image_path = f"uploads/user_profile_pictures/{uuid.uuid4()}.{profile_picture.filename.replace(" ", "")}"
-        async with aiofiles.open(image_path, "wb") as file:
-            await file.write(await profile_picture.read())
-        current_user.profile_picture = f"{DOMAIN}/{image_path}"
+        image_path = await save_image_upload(
+            upload=profile_picture,
+            directory=IMAGE_INCOMING_DIRECTORY,
+            max_size=MAX_PROFILE_PICTURE_SIZE,
+        )
+        content_hash = await store_image(image_path)
+        current_user.profile_picture = (
+            f"{DOMAIN}/{variant_path(content_hash, 'full', 'jpg')}"
+        )
+        current_user.profile_picture_hash = content_hash
     try:
         await db.commit()
         await db.refresh(current_user)
-        return current_user
     except Exception as exc:
         await db.rollback()
         raise HTTPException(status_code=400, detail=str(exc))
+    invalidate_cached_user(current_user.email)
+    return current_user
 
 # TODO: implement logic for bucket
@@ -0,0 +1,134 @@
+"""Shared fixtures. The tests run against the migrated PostgreSQL database in
+DATABASE_URL (from the environment or .env) and clean up the rows they create;
+without DATABASE_URL nothing is collected.
+
+    DATABASE_URL=postgresql+asyncpg://... python -m pytest
+"""
+
+import os
+import uuid
+
+import dotenv
+import pytest
+
+dotenv.load_dotenv()
+# operations must reach the database for the query counts and plans to mean anything
+os.environ["GRAPHQL_RESULT_CACHE"] = "off"
+
+if not os.getenv("DATABASE_URL"):
+    collect_ignore_glob = ["test_*.py"]
+
+
+class Catalog:
+    def __init__(self, tag: str, category_id: int, product_ids: list[int]):
+        self.tag = tag
+        self.category_id = category_id
+        self.product_ids = product_ids
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def engines():
+    """Dispose the pools after the test: their connections belong to its event loop."""
+    from database.engine import engine, replica_engines
+
+    yield
+    for db_engine in [engine, *replica_engines]:
+        await db_engine.dispose()
+
+
+@pytest.fixture
+async def db(engines):
+    from database.engine import async_session
+
+    async with async_session() as session:
+        yield session
+
+
+@pytest.fixture
+async def catalog(engines):
+    """A throwaway category with three lanterns, one image each."""
+    from sqlalchemy import delete
+
+    from database import models
+    from database.engine import async_session
+
+    tag = uuid.uuid4().hex[:8]
+    async with async_session() as session:
+        category = models.DBProductCategory(name=f"test_{tag}")
+        products = [
+            models.DBProduct(
+                name=f"Brass lantern {tag} {index}",
+                description="Storm-proof camping lantern",
+                price=10 + index,
+                stock=5,
+                category=category,
+                images=[models.DBProductImage(link=f"test/{tag}/{index}.jpg")],
+            )
+            for index in range(3)
+        ]
+        session.add_all(products)
+        await session.commit()
+        yield Catalog(tag, category.id, [product.id for product in products])
+
+        # images go with their products (ON DELETE CASCADE)
+        await session.execute(
+            delete(models.DBProduct).filter(models.DBProduct.category_id == category.id)
+        )
+        await session.execute(
+            delete(models.DBProductCategory).filter(
+                models.DBProductCategory.id == category.id
+            )
+        )
+        await session.commit()
+
+
+@pytest.fixture
+async def client(engines):
+    """HTTP client calling main.app in-process, without its lifespan."""
+    import httpx
+
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def admin(db):
+    """A throwaway admin user."""
+    from sqlalchemy import delete
+
+    from database import models
+    from services import image_service
+
+    email = f"test_admin_{uuid.uuid4().hex[:8]}@example.com"
+    user = models.DBUser(
+        username=email.split("@")[0],
+        email=email,
+        password="!",
+        role=models.Role.admin,
+        is_verified=True,
+    )
+    db.add(user)
+    await db.commit()
+    yield user
+    await db.execute(delete(models.DBUser).filter(models.DBUser.id == user.id))
+    await db.commit()
+    image_service.shutdown_executor()
+
+
+@pytest.fixture
+async def admin_headers(admin):
+    """Authorization header of the admin."""
+    from datetime import timedelta
+
+    from services.user_service import create_access_token
+
+    token = await create_access_token({"sub": admin.email}, timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
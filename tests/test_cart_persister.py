@@ -0,0 +1,65 @@
+import uuid
+
+import pytest
+from sqlalchemy import delete, select
+
+from database import models
+from database.engine import async_session
+from services.cart_service import CartPersister, MemoryCartStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def user_id(db):
+    email = f"test_cart_{uuid.uuid4().hex[:8]}@example.com"
+    user = models.DBUser(username=email.split("@")[0], email=email, password="!")
+    db.add(user)
+    await db.commit()
+    yield user.id
+    # carts and cart_items go with the user (ON DELETE CASCADE)
+    await db.execute(delete(models.DBUser).filter(models.DBUser.id == user.id))
+    await db.commit()
+
+
+async def persisted_cart(user_id: int) -> dict[int, int]:
+    async with async_session() as db:
+        query = await db.execute(
+            select(models.DBCartItem.product_id, models.DBCartItem.quantity).filter(
+                models.DBCartItem.user_id == user_id
+            )
+        )
+        return dict(query.all())
+
+
+async def flush_snapshot(user_id: int, cart: dict[int, int], version: int) -> None:
+    """Flush as a worker that read the cart at `version` would."""
+    store = MemoryCartStore()
+    await store.load(user_id, cart, version, dirty=True)
+    await CartPersister(store).flush_batch()
+
+
+async def test_older_snapshot_does_not_overwrite_a_newer_one(catalog, user_id):
+    first, second, _ = catalog.product_ids
+    store = MemoryCartStore()
+    await store.load(user_id, {}, 0)
+    await store.increment(user_id, first, 2)
+    (stale_cart, stale_version), *_ = await store.get_many([user_id])
+    await store.set_quantity(user_id, second, 3)
+    assert await CartPersister(store).flush_batch() == 1
+    assert await persisted_cart(user_id) == {first: 2, second: 3}
+
+    await flush_snapshot(user_id, stale_cart, stale_version)
+    assert await persisted_cart(user_id) == {first: 2, second: 3}
+
+
+async def test_older_snapshot_does_not_refill_a_cleared_cart(catalog, user_id):
+    store = MemoryCartStore()
+    await store.load(user_id, {}, 0)
+    await store.increment(user_id, catalog.product_ids[0], 1)
+    (stale_cart, stale_version), *_ = await store.get_many([user_id])
+    await store.clear(user_id)
+    await CartPersister(store).flush_batch()
+
+    await flush_snapshot(user_id, stale_cart, stale_version)
+    assert await persisted_cart(user_id) == {}
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete
+
+from database import models
+from database.engine import async_session
+from serializers.order_serializer import OrderItemInput
+from services.order_service import place_order
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def buyer(admin, catalog, db):
+    """The admin, whose orders are deleted before the catalog is."""
+    yield admin
+    await db.execute(delete(models.DBOrder).filter(models.DBOrder.user_id == admin.id))
+    await db.commit()
+
+
+async def checkout(user_id: int, items: list[OrderItemInput]) -> int | HTTPException:
+    async with async_session() as session:
+        try:
+            order = await place_order(session, user_id, items)
+        except HTTPException as exc:
+            return exc
+        return sum(item.quantity for item in order.items)
+
+
+async def test_concurrent_checkouts_never_oversell(buyer, catalog, db):
+    product_id = catalog.product_ids[0]
+    results = await asyncio.gather(
+        *[
+            checkout(buyer.id, [OrderItemInput(product_id=product_id, quantity=1)])
+            for _ in range(12)
+        ]
+    )
+    placed = sum(result for result in results if isinstance(result, int))
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    product = await db.get(models.DBProduct, product_id)
+    assert placed <= 5
+    assert product.stock >= 0
+    assert placed + product.stock == 5
+    assert {exc.status_code for exc in rejected} == {409}
+
+
+async def test_unknown_products_are_not_reported_as_out_of_stock(buyer, catalog, db):
+    product_id = catalog.product_ids[0]
+    items = [
+        OrderItemInput(product_id=product_id, quantity=1),
+        OrderItemInput(product_id=2**31 - 1, quantity=1),
+    ]
+    result = await checkout(buyer.id, items)
+    assert result.status_code == 404
+    assert result.detail["product_ids"] == [2**31 - 1]
+    # the reservation of the product that does exist was rolled back
+    assert (await db.get(models.DBProduct, product_id)).stock == 5
+
+    items = [OrderItemInput(product_id=product_id, quantity=6)]
+    result = await checkout(buyer.id, items)
+    assert (result.status_code, result.detail["product_ids"]) == (409, [product_id])
@@ -0,0 +1,102 @@
+import aiosmtplib
+import pytest
+from sqlalchemy import delete, select
+
+from database import models
+from database.engine import async_session
+from services.email_service import EMAIL_MAX_ATTEMPTS, EmailDispatcher
+
+pytestmark = pytest.mark.anyio
+
+
+class StubSMTP:
+    """Accepts every message except those to the recipients in `errors`."""
+
+    is_connected = True
+
+    def __init__(self, errors: dict[str, Exception]):
+        self.errors = errors
+        self.sent: list[str] = []
+
+    async def send_message(self, email):
+        error = self.errors.get(email["To"])
+        if error is not None:
+            raise error
+        self.sent.append(email["To"])
+
+    async def quit(self):
+        pass
+
+
+class StubDispatcher(EmailDispatcher):
+    def __init__(self, smtp: StubSMTP):
+        super().__init__()
+        self.smtp = smtp
+
+    async def _connect(self):
+        return self.smtp
+
+
+@pytest.fixture
+async def outbox(engines):
+    ids = []
+
+    async def add(recipient: str, attempts: int = 0) -> int:
+        async with async_session() as db:
+            message = models.DBEmailOutbox(
+                recipient=recipient, subject="Hi", body="Hello", attempts=attempts
+            )
+            db.add(message)
+            await db.commit()
+            ids.append(message.id)
+            return message.id
+
+    yield add
+    async with async_session() as db:
+        await db.execute(
+            delete(models.DBEmailOutbox).filter(models.DBEmailOutbox.id.in_(ids))
+        )
+        await db.commit()
+
+
+async def stored(message_id: int) -> models.DBEmailOutbox:
+    async with async_session() as db:
+        return await db.scalar(
+            select(models.DBEmailOutbox).filter(models.DBEmailOutbox.id == message_id)
+        )
+
+
+async def test_sent_retried_and_failed_messages(outbox):
+    sent = await outbox("sent@example.com")
+    retried = await outbox("busy@example.com")
+    failed = await outbox("gone@example.com", attempts=EMAIL_MAX_ATTEMPTS - 1)
+    busy = aiosmtplib.SMTPResponseException(451, "try again later")
+    smtp = StubSMTP({"busy@example.com": busy, "gone@example.com": busy})
+    await StubDispatcher(smtp).dispatch_batch()
+
+    message = await stored(sent)
+    assert message.status == models.EmailStatus.sent
+    assert message.sent_at is not None
+    message = await stored(retried)
+    assert message.status == models.EmailStatus.pending
+    assert message.attempts == 1
+    assert message.next_attempt_at > message.created_at
+    assert "try again later" in message.last_error
+    message = await stored(failed)
+    assert message.status == models.EmailStatus.failed
+    assert message.attempts == EMAIL_MAX_ATTEMPTS
+
+
+async def test_unexpected_error_does_not_resend_the_batch(outbox):
+    sent = await outbox("first@example.com")
+    broken = await outbox("broken@example.com")
+    smtp = StubSMTP({"broken@example.com": ValueError("bad header")})
+    dispatcher = StubDispatcher(smtp)
+    await dispatcher.dispatch_batch()
+    await dispatcher.dispatch_batch()
+
+    assert smtp.sent.count("first@example.com") == 1
+    assert (await stored(sent)).status == models.EmailStatus.sent
+    message = await stored(broken)
+    assert message.attempts == 1
+    assert message.last_error == "bad header"
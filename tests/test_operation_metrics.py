@@ -0,0 +1,36 @@
+import pytest
+
+from services.metrics import graphql_operation_duration
+
+pytestmark = pytest.mark.anyio
+
+
+def operation_count(operation: str) -> float:
+    for metric in graphql_operation_duration.collect():
+        for sample in metric.samples:
+            if (
+                sample.name.endswith("_count")
+                and sample.labels["operation"] == operation
+            ):
+                return sample.value
+    return 0.0
+
+
+async def test_unknown_operation_names_are_reported_as_other(client):
+    before = operation_count("other")
+    for index in range(3):
+        response = await client.post(
+            "/graphql", json={"query": f"query Made{index}Up {{ __typename }}"}
+        )
+        assert response.status_code == 200
+    assert operation_count("other") == before + 3
+    assert operation_count("Made0Up") == 0.0
+
+
+async def test_storefront_operations_keep_their_names(client):
+    before = operation_count("Cart")
+    response = await client.post(
+        "/graphql", json={"query": "query Cart { __typename }"}
+    )
+    assert response.status_code == 200
+    assert operation_count("Cart") == before + 1
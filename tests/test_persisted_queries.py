@@ -0,0 +1,67 @@
+import json
+
+import pytest
+from starlette.requests import Request
+from strawberry.asgi import ASGIRequestAdapter
+
+from schemas.extensions import query_hash
+
+pytestmark = pytest.mark.anyio
+
+QUERY = "query Typename { __typename }"
+
+
+def persisted_query(query: str) -> dict:
+    return {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}}
+
+
+async def test_unknown_hash_asks_for_the_query(client):
+    response = await client.post(
+        "/graphql", json={"extensions": persisted_query(QUERY + " ")}
+    )
+    assert response.json()["errors"][0]["extensions"]["code"] == (
+        "PERSISTED_QUERY_NOT_FOUND"
+    )
+
+
+async def test_registered_query_runs_by_hash(client):
+    response = await client.post(
+        "/graphql", json={"query": QUERY, "extensions": persisted_query(QUERY)}
+    )
+    assert response.json()["data"] == {"__typename": "Query"}
+    response = await client.get(
+        "/graphql",
+        params={"extensions": json.dumps(persisted_query(QUERY))},
+        # without a query, anything that accepts HTML gets GraphiQL
+        headers={"accept": "application/json"},
+    )
+    assert response.json()["data"] == {"__typename": "Query"}
+
+
+async def test_multipart_subscription_protocol_is_detected(engines):
+    from main import graphql_app
+
+    body = json.dumps({"query": QUERY, "extensions": persisted_query(QUERY)}).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    request = Request(
+        {
+            "type": "http",
+            "method": "POST",
+            "path": "/graphql",
+            "query_string": b"",
+            "headers": [
+                (b"content-type", b"application/json"),
+                (
+                    b"accept",
+                    b'multipart/mixed;boundary="graphql";subscriptionSpec="1.0"',
+                ),
+            ],
+        },
+        receive,
+    )
+    request_data = await graphql_app.parse_http_body(ASGIRequestAdapter(request))
+    assert request_data.protocol == "multipart-subscription"
+    assert request_data.query == QUERY
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+from sqlalchemy import select
+
+from database import models
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_export_needs_an_admin(client, catalog):
+    response = await client.get(
+        "/api/v1/products/export", params={"category_id": catalog.category_id}
+    )
+    assert response.status_code == 404  # no bearer token
+
+
+async def test_exported_products_carry_an_import_key(
+    client, db, catalog, admin_headers
+):
+    response = await client.get(
+        "/api/v1/products/export",
+        params={"category_id": catalog.category_id},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["id"] for record in records] == catalog.product_ids
+    # the catalog fixture inserts its products without a sku
+    assert [record["sku"] for record in records] == [
+        f"P-{product_id}" for product_id in catalog.product_ids
+    ]
+    skus = await db.scalars(
+        select(models.DBProduct.sku).filter(
+            models.DBProduct.category_id == catalog.category_id
+        )
+    )
+    assert None not in skus.all()
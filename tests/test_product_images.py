@@ -0,0 +1,63 @@
+import io
+import os
+import shutil
+
+import pytest
+from PIL import Image
+from sqlalchemy import select
+
+from database import models
+from services import image_service
+from services.image_service import image_directory
+
+pytestmark = pytest.mark.anyio
+
+
+def jpeg() -> bytes:
+    image = Image.new("RGB", (64, 48), tuple(os.urandom(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+async def test_upload_renders_variants(client, db, catalog, admin_headers):
+    product_id = catalog.product_ids[0]
+    response = await client.post(
+        f"/api/v1/products/{product_id}/images",
+        files={"image": ("lantern.jpg", jpeg(), "image/jpeg")},
+        headers=admin_headers,
+    )
+    assert response.status_code == 201, response.text
+    image = response.json()
+    assert image["product_id"] == product_id
+    assert {(variant["name"], variant["format"]) for variant in image["variants"]} == {
+        (name, extension)
+        for name in image_service.IMAGE_VARIANTS
+        for extension in image_service.IMAGE_FORMATS
+    }
+    content_hash = await db.scalar(
+        select(models.DBProductImage.content_hash).filter(
+            models.DBProductImage.id == image["id"]
+        )
+    )
+    try:
+        assert os.path.isfile(image_service.variant_path(content_hash, "thumb", "webp"))
+    finally:
+        shutil.rmtree(image_directory(content_hash), ignore_errors=True)
+
+
+async def test_upload_to_a_missing_product_is_404(client, admin_headers):
+    response = await client.post(
+        "/api/v1/products/0/images",
+        files={"image": ("lantern.jpg", jpeg(), "image/jpeg")},
+        headers=admin_headers,
+    )
+    assert response.status_code == 404
+
+
+async def test_upload_needs_an_admin(client, catalog):
+    response = await client.post(
+        f"/api/v1/products/{catalog.product_ids[0]}/images",
+        files={"image": ("lantern.jpg", jpeg(), "image/jpeg")},
+    )
+    assert response.status_code == 404  # no bearer token
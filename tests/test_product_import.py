@@ -0,0 +1,173 @@
+import io
+import json
+import uuid
+
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.orm import selectinload
+
+from database import models
+from services import import_service
+from services.import_service import import_products, parse_record
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def tag(db):
+    """Prefix of the skus and categories a test imports, deleted afterwards."""
+    tag = uuid.uuid4().hex[:8]
+    yield tag
+    # images go with their products (ON DELETE CASCADE)
+    await db.execute(
+        delete(models.DBProduct).filter(models.DBProduct.sku.startswith(f"{tag}-"))
+    )
+    await db.execute(
+        delete(models.DBProductCategory).filter(
+            models.DBProductCategory.name.startswith(f"test_{tag}")
+        )
+    )
+    await db.commit()
+
+
+def jsonl(*records) -> io.StringIO:
+    return io.StringIO(
+        "".join(
+            (record if isinstance(record, str) else json.dumps(record)) + "\n"
+            for record in records
+        )
+    )
+
+
+def product(tag: str, number: int, **fields) -> dict:
+    return {
+        "sku": f"{tag}-{number}",
+        "name": f"Lantern {number}",
+        "price": 10,
+        "stock": 5,
+        "category": f"test_{tag}",
+        **fields,
+    }
+
+
+async def imported(db, tag: str) -> dict[str, models.DBProduct]:
+    result = await db.scalars(
+        select(models.DBProduct)
+        .execution_options(populate_existing=True)
+        .options(
+            selectinload(models.DBProduct.category),
+            selectinload(models.DBProduct.images),
+        )
+        .filter(models.DBProduct.sku.startswith(f"{tag}-"))
+    )
+    return {product.sku: product for product in result}
+
+
+async def test_csv_import(client, db, tag, admin_headers):
+    csv_file = (
+        "sku,name,description,price,discount_price,stock,category,"
+        "category_description,images\n"
+        f"{tag}-1,Brass lantern,Storm-proof,19.5,,4,test_{tag},Lights,a.jpg|b.jpg\n"
+        f"{tag}-2,Tin lantern,,9,7.5,0,test_{tag},Lights,\n"
+    )
+    response = await client.post(
+        "/api/v1/products/import",
+        files={"file": ("products.csv", csv_file.encode(), "text/csv")},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200, response.text
+    assert response.json() == {
+        "rows_read": 2,
+        "rows_imported": 2,
+        "error_count": 0,
+        "errors": [],
+    }
+    products = await imported(db, tag)
+    brass, tin = products[f"{tag}-1"], products[f"{tag}-2"]
+    assert (brass.name, brass.price, brass.stock) == ("Brass lantern", 19.5, 4)
+    assert brass.category.description == "Lights"
+    assert sorted(image.link for image in brass.images) == ["a.jpg", "b.jpg"]
+    assert (tin.discount_price, tin.description, tin.images) == (7.5, None, [])
+
+
+async def test_jsonl_reimport_updates_and_the_last_line_wins(db, tag):
+    report = await import_products(
+        db, jsonl(product(tag, 1, images=["a.jpg"]), product(tag, 2)), "jsonl"
+    )
+    assert report.rows_imported == 2
+    first_id = (await imported(db, tag))[f"{tag}-1"].id
+
+    report = await import_products(
+        db,
+        jsonl(
+            product(tag, 1, price=12, images=["b.jpg"]),
+            product(tag, 1, price=15, stock=1),
+        ),
+        "jsonl",
+    )
+    assert report.as_dict()["error_count"] == 0
+    products = await imported(db, tag)
+    updated = products[f"{tag}-1"]
+    assert updated.id == first_id
+    assert (updated.price, updated.stock) == (15, 1)
+    # images are only ever added
+    assert sorted(image.link for image in updated.images) == ["a.jpg", "b.jpg"]
+    assert len(products) == 2
+
+
+async def test_invalid_rows_are_reported_by_line(db, tag):
+    report = await import_products(
+        db,
+        jsonl(
+            product(tag, 1),
+            product(tag, 2, price="nan"),
+            "{not json",
+            product(tag, 4, stock=True),
+            product(tag, 5, stock=2.7),
+            product(tag, 6, name=""),
+            product(tag, 7, price="inf"),
+            product(tag, 8, stock=3.0),
+        ),
+        "jsonl",
+    )
+    assert report.rows_read == 8
+    assert report.rows_imported == 2
+    assert [error["line"] for error in report.errors] == [2, 3, 4, 5, 6, 7]
+    assert report.errors[0]["error"] == "`price` must be a finite number"
+    assert report.errors[3]["error"] == "`stock` must be a whole number"
+    assert set(await imported(db, tag)) == {f"{tag}-1", f"{tag}-8"}
+
+
+def test_parse_record_rejects_non_numbers():
+    record = {"sku": "x", "name": "x", "price": 1, "category": "x"}
+    for field, value in [
+        ("price", "-inf"),
+        ("price", False),
+        ("discount_price", float("nan")),
+        ("stock", "1.5"),
+    ]:
+        with pytest.raises(ValueError):
+            parse_record(1, {**record, field: value})
+    assert parse_record(1, {**record, "stock": "7"})[6] == 7
+
+
+async def test_batch_rejected_by_the_database(db, tag, monkeypatch):
+    monkeypatch.setattr(import_service, "IMPORT_BATCH_SIZE", 2)
+    report = await import_products(
+        db,
+        jsonl(
+            product(tag, 1),
+            product(tag, 2),
+            # valid input, but out of range for the integer column
+            product(tag, 3, stock=2**31),
+            product(tag, 4),
+        ),
+        "jsonl",
+    )
+    assert report.rows_imported == 2
+    assert [error["line"] for error in report.errors] == [3, 4]
+    assert all(
+        error["error"].startswith("batch rejected by the database")
+        for error in report.errors
+    )
+    assert set(await imported(db, tag)) == {f"{tag}-1", f"{tag}-2"}
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from services.product_service import build_products_listing_query
+
+pytestmark = pytest.mark.anyio
+
+JOIN_NODES = {"Nested Loop", "Hash Join", "Merge Join"}
+
+
+def compile_sql(query, literal_binds: bool = False) -> str:
+    return str(
+        query.compile(
+            dialect=postgresql.dialect(),
+            compile_kwargs={"literal_binds": literal_binds},
+        )
+    )
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+@pytest.mark.parametrize("after", [None, ("Brass lantern", 5)])
+def test_listing_query_reads_products_only(after):
+    sql = compile_sql(build_products_listing_query(first=20, after=after)).upper()
+    assert " JOIN " not in sql
+    assert "DISTINCT" not in sql
+    assert "PRODUCT_IMAGES" not in sql
+
+
+async def test_listing_plan_has_no_join_or_deduplication(db, catalog):
+    query = build_products_listing_query(first=20, category_id=catalog.category_id)
+    explained = await db.scalar(
+        text(f"EXPLAIN (FORMAT JSON) {compile_sql(query, literal_binds=True)}")
+    )
+    plan = json.loads(explained) if isinstance(explained, str) else explained
+    node_types = {node["Node Type"] for node in plan_nodes(plan[0]["Plan"])}
+    assert not node_types & JOIN_NODES
+    assert "Unique" not in node_types
+    assert "Aggregate" not in node_types
@@ -0,0 +1,65 @@
+import pytest
+
+from schemas.storefront_queries import STOREFRONT_QUERIES
+
+pytestmark = pytest.mark.anyio
+
+SEARCH_PAGE = """
+    query Search($query: String!, $after: String) {
+      searchProducts(query: $query, first: 2, after: $after) {
+        edges { cursor node { id name } }
+        pageInfo { hasNextPage }
+      }
+    }
+"""
+
+
+async def graphql(client, query: str, variables: dict) -> dict:
+    response = await client.post(
+        "/graphql", json={"query": query, "variables": variables}
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert "errors" not in body, body["errors"]
+    return body["data"]
+
+
+async def test_search_pages_through_matches(client, catalog):
+    first = (await graphql(client, SEARCH_PAGE, {"query": catalog.tag}))[
+        "searchProducts"
+    ]
+    assert first["pageInfo"]["hasNextPage"] is True
+    rest = (
+        await graphql(
+            client,
+            SEARCH_PAGE,
+            {"query": catalog.tag, "after": first["edges"][-1]["cursor"]},
+        )
+    )["searchProducts"]
+    assert rest["pageInfo"]["hasNextPage"] is False
+    found = [edge["node"]["id"] for edge in first["edges"] + rest["edges"]]
+    assert sorted(found) == catalog.product_ids
+
+
+async def test_storefront_search_next_to_the_listing(client, catalog):
+    query = """
+        query Both($query: String!, $categoryId: Int) {
+          searchProducts(query: $query, first: 5) { edges { node { id } } }
+          getAllProducts(first: 5, filters: {categoryId: $categoryId}) {
+            edges { node { id } }
+          }
+        }
+    """
+    data = await graphql(
+        client, query, {"query": catalog.tag, "categoryId": catalog.category_id}
+    )
+    assert {edge["node"]["id"] for edge in data["searchProducts"]["edges"]} == set(
+        catalog.product_ids
+    )
+    assert len(data["getAllProducts"]["edges"]) == 3
+    data = await graphql(
+        client,
+        STOREFRONT_QUERIES["product search"],
+        {"query": catalog.tag, "first": 20},
+    )
+    assert len(data["searchProducts"]["edges"]) == 3
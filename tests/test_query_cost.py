@@ -0,0 +1,49 @@
+import pytest
+from graphql import get_introspection_query, get_operation_ast, parse
+
+from schemas.cost import operation_cost
+from schemas.extensions import GRAPHQL_MAX_COST
+from schemas.schema_rooting import schema
+from schemas.storefront_queries import STOREFRONT_QUERIES
+from services.pagination import DEFAULT_PAGE_SIZE
+
+
+def cost(query: str, variables: dict | None = None) -> int:
+    document = parse(query)
+    operation = get_operation_ast(document)
+    return operation_cost(schema._schema, document, operation, variables).cost
+
+
+@pytest.mark.parametrize("name", STOREFRONT_QUERIES)
+def test_storefront_query_fits_the_budget(name):
+    variables = {"first": DEFAULT_PAGE_SIZE, "query": "lantern"}
+    assert cost(STOREFRONT_QUERIES[name], variables) <= GRAPHQL_MAX_COST
+
+
+def test_get_all_users_allows_only_narrow_selections():
+    assert cost("{ getAllUsers { id username email role } }") <= GRAPHQL_MAX_COST
+    assert (
+        cost(
+            "{ getAllUsers { id username email profilePicture role phoneNumber"
+            " isVerified createdAt } }"
+        )
+        > GRAPHQL_MAX_COST
+    )
+
+
+def test_one_schema_query_fits_the_budget():
+    assert cost(get_introspection_query(descriptions=True)) <= GRAPHQL_MAX_COST
+
+
+def test_repeated_introspection_goes_over_the_budget():
+    types = "types { name fields { name type { name kind } } }"
+    aliased = " ".join(f"s{index}: __schema {{ {types} }}" for index in range(50))
+    assert cost(f"{{ {aliased} }}") > GRAPHQL_MAX_COST
+
+    nested = "fields { name type { fields { name type { fields { name } } } } }"
+    copies = " ".join(f"f{index}: {nested}" for index in range(10))
+    assert cost(f"{{ __schema {{ types {{ {copies} }} }} }}") > GRAPHQL_MAX_COST
+
+
+def test_typename_is_free():
+    assert cost("{ __typename }") == 0
@@ -0,0 +1,49 @@
+import pytest
+
+from database import models
+from database.query_tracker import assert_num_queries
+from schemas.storefront_queries import STOREFRONT_QUERIES
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_my_orders_query_count_does_not_grow_with_orders(
+    client, db, catalog, admin, admin_headers
+):
+    for product_id in catalog.product_ids:
+        db.add(
+            models.DBOrder(
+                user_id=admin.id,
+                total_price=10,
+                items=[
+                    models.DBOrderItem(product_id=product_id, quantity=1, unit_price=10)
+                ],
+            )
+        )
+    await db.commit()
+    # the user, their orders, and the items of all of them
+    with assert_num_queries(3):
+        response = await client.get("/api/v1/orders", headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == len(catalog.product_ids)
+
+
+@pytest.mark.parametrize("first", [1, 3])
+async def test_product_listing_query_count_does_not_grow_with_the_page(
+    client, catalog, first
+):
+    # the products, then one batch each for their categories and images
+    with assert_num_queries(3):
+        response = await client.post(
+            "/graphql",
+            json={
+                "query": STOREFRONT_QUERIES["product listing"],
+                "variables": {
+                    "first": first,
+                    "filters": {"categoryId": catalog.category_id},
+                },
+            },
+        )
+    body = response.json()
+    assert "errors" not in body
+    assert len(body["data"]["getAllProducts"]["edges"]) == first
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import engine as db_engine
+from database.engine import ReadSession, engine, warm_up_replicas
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_unreachable_replica_does_not_stop_startup(engines, monkeypatch):
+    unreachable = create_async_engine(
+        "postgresql+asyncpg://nobody@127.0.0.1:1/none", connect_args={"timeout": 1}
+    )
+    monkeypatch.setattr(db_engine, "replica_engines", [unreachable])
+    monkeypatch.setattr(db_engine, "_replica_down_until", [0.0])
+    try:
+        await warm_up_replicas()
+    finally:
+        await unreachable.dispose()
+    assert db_engine._replica_down_until[0] > time.monotonic()
+
+
+async def test_read_session_connects_per_statement(engines):
+    read_db = ReadSession()
+    assert engine.sync_engine.pool.checkedout() == 0
+    assert await read_db.scalar(text("SELECT 1")) == 1
+    result = await read_db.execute(text("SELECT 2"))
+    assert engine.sync_engine.pool.checkedout() == 0
+    assert result.scalar_one() == 2
+
+
+async def test_concurrent_listings_fit_a_small_replica_pool(
+    client, catalog, monkeypatch
+):
+    small_pool = create_async_engine(
+        os.environ["DATABASE_URL"], pool_size=2, max_overflow=0, pool_timeout=2
+    )
+    monkeypatch.setattr(
+        db_engine,
+        "replica_sessions",
+        [sessionmaker(bind=small_pool, class_=AsyncSession, expire_on_commit=False)],
+    )
+    monkeypatch.setattr(db_engine, "_replica_down_until", [0.0])
+    query = """
+        query Listing($first: Int!, $categoryId: Int) {
+          getAllProducts(first: $first, filters: {categoryId: $categoryId}) {
+            edges { node { id category { name } images { link } } }
+          }
+        }
+    """
+    try:
+        responses = await asyncio.gather(
+            *[
+                client.post(
+                    "/graphql",
+                    json={
+                        "query": query,
+                        # distinct keys, so the loads aren't coalesced
+                        "variables": {
+                            "first": 3 + index,
+                            "categoryId": catalog.category_id,
+                        },
+                    },
+                )
+                for index in range(4)
+            ]
+        )
+        assert [response.json().get("errors") for response in responses] == [None] * 4
+        assert small_pool.sync_engine.pool.checkedout() == 0
+    finally:
+        await small_pool.dispose()
@@ -0,0 +1,174 @@
+import asyncio
+import io
+import json
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import engine as db_engine
+from database import models
+from services.import_service import import_products
+from services.order_service import reserve_stock
+from services.result_cache import MemoryResultStore, result_store
+
+pytestmark = pytest.mark.anyio
+
+LISTING = """
+    query Listing($categoryId: Int) {
+      getAllProducts(first: 5, filters: {categoryId: $categoryId}) {
+        edges { node { id name category { name } images { link } } }
+      }
+    }
+"""
+
+
+class UnavailableStore(MemoryResultStore):
+    async def tag_versions(self, tags):
+        raise ConnectionError("cache is down")
+
+
+async def listing(client, catalog) -> dict:
+    response = await client.post(
+        "/graphql",
+        json={"query": LISTING, "variables": {"categoryId": catalog.category_id}},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.fixture
+def store(monkeypatch) -> MemoryResultStore:
+    store = MemoryResultStore()
+    monkeypatch.setattr(result_store, "backend", store)
+    return store
+
+
+async def invalidated() -> None:
+    """Wait for the invalidations the commits so far have started."""
+    await asyncio.gather(*result_store._invalidations)
+
+
+async def test_repeated_query_is_a_hit(client, catalog, store):
+    first = await listing(client, catalog)
+    second = await listing(client, catalog)
+    assert first["extensions"]["resultCache"] == {"hit": False}
+    assert second["extensions"]["resultCache"] == {"hit": True}
+    assert second["data"] == first["data"]
+
+
+@pytest.mark.parametrize(
+    "model, tag",
+    [
+        (models.DBProduct, "products"),
+        (models.DBProductCategory, "categories"),
+        (models.DBProductImage, "images"),
+    ],
+)
+async def test_orm_write_invalidates_after_commit(
+    client, catalog, db, store, model, tag
+):
+    await listing(client, catalog)
+    if model is models.DBProductCategory:
+        entity = await db.get(model, catalog.category_id)
+        entity.description = "Changed"
+    elif model is models.DBProduct:
+        entity = await db.get(model, catalog.product_ids[0])
+        entity.name = f"Renamed lantern {catalog.tag}"
+    else:
+        entity = await db.scalar(
+            select(model).filter(model.product_id == catalog.product_ids[0])
+        )
+        entity.link = f"test/{catalog.tag}/changed.jpg"
+    await db.flush()
+    await invalidated()
+    assert store.versions.get(tag, 0) == 0  # not before the commit
+
+    await db.commit()
+    await invalidated()
+    assert store.versions[tag] == 1
+    assert (await listing(client, catalog))["extensions"]["resultCache"] == {
+        "hit": False
+    }
+
+
+async def test_bulk_update_invalidates(client, catalog, db, store):
+    await listing(client, catalog)
+    assert await reserve_stock(db, catalog.product_ids[0], 1) is not None
+    await db.commit()
+    await invalidated()
+    assert store.versions == {"products": 1}
+    assert (await listing(client, catalog))["extensions"]["resultCache"] == {
+        "hit": False
+    }
+
+
+async def test_import_invalidates(client, catalog, db, store):
+    await listing(client, catalog)
+    record = {
+        "sku": f"{catalog.tag}-1",
+        "name": f"Imported lantern {catalog.tag}",
+        "price": 10,
+        "category": f"test_{catalog.tag}",
+    }
+    report = await import_products(db, io.StringIO(json.dumps(record)), "jsonl")
+    assert report.rows_imported == 1
+    await invalidated()
+    assert store.versions == {"products": 1, "categories": 1, "images": 1}
+    assert (await listing(client, catalog))["extensions"]["resultCache"] == {
+        "hit": False
+    }
+
+
+async def test_rolled_back_write_does_not_invalidate(client, catalog, db, store):
+    await listing(client, catalog)
+    await db.execute(
+        update(models.DBProduct)
+        .filter(models.DBProduct.id == catalog.product_ids[0])
+        .values(stock=0)
+    )
+    await db.rollback()
+    # nor does the next commit of the same session
+    await db.commit()
+    await invalidated()
+    assert store.versions == {}
+    assert (await listing(client, catalog))["extensions"]["resultCache"] == {
+        "hit": True
+    }
+
+
+async def test_cache_outage_does_not_fail_the_query(client, catalog, monkeypatch):
+    monkeypatch.setattr(result_store, "backend", UnavailableStore())
+    body = await listing(client, catalog)
+    assert "errors" not in body
+    assert len(body["data"]["getAllProducts"]["edges"]) == 3
+    assert "resultCache" not in body.get("extensions", {})
+
+
+@pytest.fixture
+async def unreachable_replica(monkeypatch):
+    unreachable = create_async_engine(
+        "postgresql+asyncpg://nobody@127.0.0.1:1/none", connect_args={"timeout": 1}
+    )
+    monkeypatch.setattr(
+        db_engine,
+        "replica_sessions",
+        [sessionmaker(bind=unreachable, class_=AsyncSession)],
+    )
+    monkeypatch.setattr(db_engine, "_replica_down_until", [0.0])
+    yield
+    await unreachable.dispose()
+
+
+async def test_cache_misses_are_filled_from_the_primary(
+    client, catalog, monkeypatch, unreachable_replica
+):
+    monkeypatch.setattr(result_store, "backend", MemoryResultStore())
+    body = await listing(client, catalog)
+    assert body["extensions"]["resultCache"] == {"hit": False}
+    assert db_engine._replica_down_until == [0.0]  # never tried
+
+    monkeypatch.setattr(result_store, "backend", None)
+    await listing(client, catalog)
+    assert db_engine._replica_down_until[0] > 0.0  # tried, and skipped
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+
+from services.single_flight import (
+    SingleFlight,
+    drain_single_flights,
+    single_flight_groups,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def flight():
+    flight = SingleFlight("test")
+    yield flight
+    single_flight_groups.remove(flight)
+
+
+async def test_drain_waits_for_flights_their_callers_abandoned(flight):
+    finished = asyncio.Event()
+
+    async def load() -> int:
+        await asyncio.sleep(0.05)
+        finished.set()
+        return 1
+
+    caller = asyncio.ensure_future(flight.do("key", load))
+    await asyncio.sleep(0)
+    caller.cancel()
+    assert flight.in_flight == 1
+    await drain_single_flights()
+    assert finished.is_set()
+    assert flight.in_flight == 0
+
+
+def metric(name: str) -> float:
+    return REGISTRY.get_sample_value(name, {"group": "test"}) or 0.0
+
+
+async def test_concurrent_callers_share_one_call(flight):
+    calls_before = metric("single_flight_calls_total")
+    coalesced_before = metric("single_flight_coalesced_total")
+    runs = 0
+    release = asyncio.Event()
+
+    async def load() -> list[int]:
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        return [runs]
+
+    callers = [asyncio.ensure_future(flight.do("key", load)) for _ in range(10)]
+    await asyncio.sleep(0)
+    assert flight.in_flight == 1
+    release.set()
+    results = await asyncio.gather(*callers)
+
+    assert runs == 1
+    assert all(result is results[0] for result in results)
+    assert (flight.calls, flight.coalesced, flight.in_flight) == (10, 9, 0)
+    assert metric("single_flight_calls_total") - calls_before == 10
+    assert metric("single_flight_coalesced_total") - coalesced_before == 9
+
+
+async def test_timeout_fails_every_waiter_and_frees_the_key(flight):
+    timeouts_before = metric("single_flight_timeouts_total")
+
+    async def hang() -> int:
+        await asyncio.Event().wait()
+
+    results = await asyncio.gather(
+        *[flight.do("key", hang, timeout=0.01) for _ in range(3)],
+        return_exceptions=True,
+    )
+    assert all(
+        isinstance(result, HTTPException) and result.status_code == 503
+        for result in results
+    )
+    assert flight.timeouts == 1
+    assert metric("single_flight_timeouts_total") - timeouts_before == 1
+    assert flight.in_flight == 0
+
+    async def load() -> int:
+        return 2
+
+    assert await flight.do("key", load) == 2
+
+
+async def test_cancelled_caller_does_not_cancel_the_others(flight):
+    release = asyncio.Event()
+    finished = False
+
+    async def load() -> int:
+        nonlocal finished
+        await release.wait()
+        finished = True
+        return 1
+
+    cancelled = asyncio.ensure_future(flight.do("key", load))
+    waiting = asyncio.ensure_future(flight.do("key", load))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await waiting == 1
+    assert finished
+    assert cancelled.cancelled()
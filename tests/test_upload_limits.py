@@ -0,0 +1,67 @@
+import pytest
+
+from api.body_size_limit import MULTIPART_OVERHEAD
+from schemas.extensions import GRAPHQL_MAX_BODY_SIZE
+from services.upload_service import MAX_PROFILE_PICTURE_SIZE
+
+pytestmark = pytest.mark.anyio
+
+LIMIT = MAX_PROFILE_PICTURE_SIZE + MULTIPART_OVERHEAD
+CHUNK = 64 * 1024
+
+
+def multipart_head(boundary: str) -> bytes:
+    return (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="profile_picture"; '
+        'filename="big.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + b"\xff\xd8\xff"
+
+
+async def test_declared_oversized_upload_is_rejected_up_front(client):
+    response = await client.patch(
+        "/api/v1/users/my-profile",
+        content=b"x",
+        headers={"content-length": str(LIMIT + 1)},
+    )
+    assert response.status_code == 413
+
+
+async def test_streamed_upload_stops_at_the_limit(client):
+    sent = 0
+    total = LIMIT + 10 * CHUNK
+
+    async def body():
+        nonlocal sent
+        yield multipart_head("limit")
+        while sent < total:
+            sent += CHUNK
+            yield b"\0" * CHUNK
+
+    response = await client.patch(
+        "/api/v1/users/my-profile",
+        content=body(),
+        headers={"content-type": "multipart/form-data; boundary=limit"},
+    )
+    assert response.status_code == 413
+    assert sent < total
+
+
+async def test_upload_within_the_limit_reaches_the_endpoint(client):
+    response = await client.patch(
+        "/api/v1/users/my-profile",
+        content=multipart_head("small") + b"\0" * CHUNK + b"\r\n--small--\r\n",
+        headers={"content-type": "multipart/form-data; boundary=small"},
+    )
+    # stopped by authentication, after the body was parsed
+    assert response.status_code != 413
+
+
+async def test_oversized_graphql_document_is_rejected(client):
+    aliases = " ".join(
+        f"s{index}: __schema {{ types {{ name }} }}"
+        for index in range(GRAPHQL_MAX_BODY_SIZE // 20)
+    )
+    response = await client.post("/graphql", json={"query": f"{{ {aliases} }}"})
+    assert response.status_code == 413